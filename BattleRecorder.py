@@ -0,0 +1,177 @@
+import os
+import random
+import struct
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from bots.StateCodec import STATE_DTYPE, encode_state, decode_state
+
+from vgc.behaviour import BattlePolicy, TeamSelectionPolicy, TeamBuildPolicy
+from vgc.competition.BattleMatch import BattleMatch
+from vgc.competition.Competitor import Competitor, CompetitorManager
+from vgc.datatypes.Objects import GameState
+
+# trajectory file: fixed-size header followed by one RECORD_DTYPE record per turn
+#   header: magic, version, record size, seed, winner (-1 while the battle is running)
+MAGIC = b'FBTR'
+VERSION = 1
+HEADER = struct.Struct('<4sHIqi')
+HEADER_SIZE = 64
+
+RECORD_DTYPE = np.dtype([('step', '<u4'), ('states', STATE_DTYPE, (2,)), ('actions', 'i1', (2,))])
+
+class TrajectoryWriter():
+
+    def __init__(self, path: str, seed: int = -1):
+        self.path = path
+        self.seed = seed
+        self.n_records = 0
+        self._f = open(path, 'wb')
+        self._write_header(-1)
+        self._f.seek(HEADER_SIZE)
+
+    def _write_header(self, winner: int) -> None:
+        self._f.seek(0)
+        self._f.write(HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, self.seed, winner).ljust(HEADER_SIZE, b'\0'))
+
+    def write(self, states, actions: Tuple[int, int]) -> None:
+        # states: the two sides' observations already encoded with encode_state (None leaves them zeroed)
+        rec = np.zeros((), dtype=RECORD_DTYPE)
+        rec['step'] = self.n_records
+        for side in range(2):
+            if states[side] is not None:
+                rec['states'][side] = states[side]
+        rec['actions'] = actions
+        self._f.write(rec.tobytes())
+        # streamed: a crashed battle still leaves every completed turn on disk
+        self._f.flush()
+        self.n_records += 1
+
+    def close(self, winner: int = -1) -> None:
+        self._write_header(winner)
+        self._f.close()
+
+class TrajectoryReader():
+    # memory-mapped: records are decoded to GameStates only when asked for
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, itemsize, self.seed, self.winner = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or itemsize != RECORD_DTYPE.itemsize:
+            raise ValueError(f'{path} is not a version {VERSION} trajectory file')
+        n = (os.path.getsize(path) - HEADER_SIZE) // itemsize
+        if n > 0:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(n,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def state(self, i: int, side: int = 0) -> GameState:
+        # the position as seen by player `side`, ready to be passed to get_action
+        return decode_state(self.records[i]['states'][side])
+
+    def actions(self, i: int) -> Tuple[int, int]:
+        a = self.records[i]['actions']
+        return int(a[0]), int(a[1])
+
+    def __iter__(self) -> Iterator[Tuple[GameState, Tuple[int, int]]]:
+        for i in range(len(self)):
+            yield self.state(i), self.actions(i)
+
+    def refeed(self, policy: BattlePolicy, side: int = 0) -> List[Tuple[int, int]]:
+        # replays every recorded position to `policy`, returns (recorded action, new action) per turn
+        return [(self.actions(i)[side], policy.get_action(self.state(i, side))) for i in range(len(self))]
+
+class BattleRecorder():
+    # collects the observation and the action of both sides, a turn is written once both have acted
+
+    def __init__(self, writer: TrajectoryWriter):
+        self.writer = writer
+        self._pending = [None, None]
+
+    def observe(self, side: int, state, action: int) -> None:
+        if self._pending[side] is not None:
+            # the other side did not act (e.g. forced switch), the turn is written with action -1
+            self._flush()
+        self._pending[side] = (state, action)
+        if self._pending[1 - side] is not None:
+            self._flush()
+
+    def _flush(self) -> None:
+        empty = (None, -1)
+        s0, a0 = self._pending[0] or empty
+        s1, a1 = self._pending[1] or empty
+        self.writer.write((s0, s1), (a0, a1))
+        self._pending = [None, None]
+
+    def close(self, winner: int = -1) -> None:
+        if self._pending != [None, None]:
+            self._flush()
+        self.writer.close(winner)
+
+class RecordingPolicy(BattlePolicy):
+
+    def __init__(self, policy: BattlePolicy, recorder: BattleRecorder, side: int):
+        self.policy = policy
+        self.recorder = recorder
+        self.side = side
+
+    def requires_encode(self) -> bool:
+        return self.policy.requires_encode()
+
+    def close(self):
+        self.policy.close()
+
+    def get_action(self, g) -> int:
+        # the state is encoded before get_action, some policies modify it (e.g. estimate_move);
+        # a policy that asks for encoded observations does not see a GameState, its side stays zeroed
+        state = encode_state(g) if hasattr(g, 'teams') else None
+        action = self.policy.get_action(g)
+        self.recorder.observe(self.side, state, action)
+        return action
+
+class RecordingCompetitor(Competitor):
+
+    def __init__(self, competitor: Competitor, recorder: BattleRecorder, side: int):
+        self.competitor = competitor
+        self._battle_policy = RecordingPolicy(competitor.battle_policy, recorder, side)
+
+    @property
+    def name(self):
+        return self.competitor.name
+
+    @property
+    def team_build_policy(self) -> TeamBuildPolicy:
+        return self.competitor.team_build_policy
+
+    @property
+    def team_selection_policy(self) -> TeamSelectionPolicy:
+        return self.competitor.team_selection_policy
+
+    @property
+    def battle_policy(self) -> BattlePolicy:
+        return self._battle_policy
+
+def record_battle(cm0: CompetitorManager, cm1: CompetitorManager, path: str, seed: int = None, debug: bool = False) -> int:
+    # runs a BattleMatch like Tournament/BattleTester do, streaming every turn to `path`; returns the winner
+    if seed is None:
+        seed = random.randrange(2**31)
+    random.seed(seed)
+    np.random.seed(seed)
+    recorder = BattleRecorder(TrajectoryWriter(path, seed))
+    rcm0 = CompetitorManager(RecordingCompetitor(cm0.competitor, recorder, 0))
+    rcm1 = CompetitorManager(RecordingCompetitor(cm1.competitor, recorder, 1))
+    rcm0.team = cm0.team
+    rcm1.team = cm1.team
+    winner = -1
+    try:
+        match = BattleMatch(rcm0, rcm1, debug=debug)
+        match.run()
+        winner = match.winner()
+    finally:
+        recorder.close(winner)
+    return winner
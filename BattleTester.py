@@ -13,10 +13,12 @@ from vgc.util.generator.PkmRosterGenerators import RandomPkmRosterGenerator
 from vgc.util.generator.PkmTeamGenerators import RandomTeamFromRoster
 
 from vgc.behaviour.BattlePolicies import TerminalPlayer, Minimax, PrunedBFS
-import pandas as pd
 import numpy as np
 
-def main():
+from BattleRecorder import record_battle
+from ResultsStore import ResultsStore, append_result_csv
+
+def main(store: ResultsStore):
   n_matches: int = 5
   debug: bool = False
   c0 = fCompetitor('Player1')
@@ -27,6 +29,8 @@ def main():
   opp_policy = "MiniMax"
   #write the depth (0 for greedy)
   max_depth = 0
+  #directory where every battle is recorded (None to disable)
+  record_dir = None
   #assing policies to competitors
   c0._battle_policy = GreedyPolicy()
   c1._battle_policy = Minimax()
@@ -47,10 +51,14 @@ def main():
     for _ in range(2):
       for _ in tqdm(range(5), leave=False):
         j+=1
-        match = BattleMatch(cm0, cm1, debug=debug)
-        match.run()
-        wins0 += match.winner() == 0
-        total_wins += match.winner() == 0
+        if record_dir is None:
+          match = BattleMatch(cm0, cm1, debug=debug)
+          match.run()
+          winner = match.winner()
+        else:
+          winner = record_battle(cm0, cm1, f'{record_dir}/{our_policy}-{opp_policy}-{i}-{j}.fbtr', debug=debug)
+        wins0 += winner == 0
+        total_wins += winner == 0
         pbar.set_description(f'Matches won: {wins0}/{j}, Competitions won: {tot_wins}/{i}')
       tmp_team = cm0.team
       cm0.team = cm1.team
@@ -59,32 +67,29 @@ def main():
     # print(f'{match.cms[match.winner()].competitor.name} won')
     tot_wins += wins0 > 5
     tot_ties += wins0 == 5
+  # ferma gli eventuali thread di ponder delle policy
+  c0.battle_policy.close()
+  c1.battle_policy.close()
 
-  write_results(our_policy, opp_policy, round(max_depth,0), round((total_wins*10)/n_matches, 3), tot_wins)
+  write_results(store, our_policy, opp_policy, round(max_depth,0), round((total_wins*10)/n_matches, 3), tot_wins)
 
   print(f'{c0.name} won {tot_wins}/{n_matches}, tied {tot_ties}/{n_matches} and lost {n_matches-tot_ties-tot_wins}/{n_matches} competitions. \nTotal battle wins: {total_wins}')
 
 
-def write_results(our_policy, opp_policy, max_depth, tot_wins, total_wins):
-  res = pd.read_csv('results.csv')
-  res.loc[len(res)] = [our_policy, opp_policy, max_depth, tot_wins, total_wins]
-  sorted_res = res.sort_values(by=["our_policy", "max_depth", "opp_policy"])
-  sorted_res.to_csv("results.csv", index=False)
+def write_results(store, our_policy, opp_policy, max_depth, tot_wins, total_wins):
+  store.add_result(our_policy, opp_policy, max_depth, tot_wins, total_wins)
+  # results.csv resta lo storico completo in chiaro: accodo solo la nuova riga
+  append_result_csv('results.csv', (our_policy, opp_policy, max_depth, tot_wins, total_wins))
 
 if __name__=='__main__':
+  store = ResultsStore()
+  # la prima volta importo lo storico di results.csv (con lo store già pieno il file non viene letto)
+  store.import_csv('results.csv')
   for i in range(1):
-    main()
-  # Raggruppa per ogni accoppiamento e calcola la media e il conteggio
-  res = pd.read_csv('results.csv')
-  means = (
-    res.groupby(["opp_policy", "our_policy", "max_depth"])
-    .agg(
-        mean_perc_matches_wins=("%_matches_wins", "mean"),
-        number_of_tests=("%_matches_wins", "count"),
-        mean_comp_wins=("competitions_wins", "mean")
-    )
-    .reset_index()
-  )
-  print(means)
-  means.to_csv("risultati_aggregati.csv", index=False)
-
+    main(store)
+  # gli aggregati per accoppiamento sono già aggiornati ad ogni risultato, qui li esporto soltanto
+  means = store.aggregates()
+  for row in means:
+    print(row)
+  store.export_aggregates("risultati_aggregati.csv")
+  store.close()
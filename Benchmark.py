@@ -0,0 +1,196 @@
+import argparse
+import glob
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+import numpy as np
+
+from bots.StateCodec import STATE_DTYPE, decode_state
+from TournamentConfig import ParticipantSpec
+
+# decision-throughput benchmark of the battle policies over a fixed, seeded corpus of positions
+CORPUS_PATH = 'benchmarks/corpus.npy'
+RESULTS_DIR = 'benchmarks/results'
+CORPUS_SEED = 2024
+CATEGORIES = ['early', 'mid', 'endgame', 'switch']
+CORPUS_DTYPE = np.dtype([('state', STATE_DTYPE), ('category', 'u1'), ('step', '<u2')])
+
+POLICIES = {
+    'Greedy': ParticipantSpec('Greedy', 'bots.GreedyPolicy:GreedyPolicy'),
+    'Mixed2': ParticipantSpec('Mixed2', 'bots.MixedPolicy:MixedPolicy', [2]),
+    'Mixed4': ParticipantSpec('Mixed4', 'bots.MixedPolicy:MixedPolicy', [4]),
+    'Mixed6': ParticipantSpec('Mixed6', 'bots.MixedPolicy:MixedPolicy', [6]),
+    'AlphaBeta2': ParticipantSpec('AlphaBeta2', 'bots.AlphaBetaPolicy:AlphaBetaPolicy', [2]),
+    'AlphaBeta4': ParticipantSpec('AlphaBeta4', 'bots.AlphaBetaPolicy:AlphaBetaPolicy', [4]),
+    'AlphaBeta6': ParticipantSpec('AlphaBeta6', 'bots.AlphaBetaPolicy:AlphaBetaPolicy', [6]),
+    # selective search (bots/SelectiveSearch.py), to compare node counts with the full-width versions
+    'Mixed4S': ParticipantSpec('Mixed4S', 'bots.MixedPolicy:MixedPolicy', [4], {'selective': True}),
+    'AlphaBeta4S': ParticipantSpec('AlphaBeta4S', 'bots.AlphaBetaPolicy:AlphaBetaPolicy', [4], {'selective': True}),
+}
+
+def _n_fainted(team) -> int:
+    return int((team['pkms']['hp'][:team['n_pkms']] <= 0).sum())
+
+def classify(state, step: int, action: int) -> str:
+    if action >= 4:
+        return 'switch'
+    fainted = _n_fainted(state['teams'][0]) + _n_fainted(state['teams'][1])
+    if _n_fainted(state['teams'][0]) >= 2 or _n_fainted(state['teams'][1]) >= 2 or fainted >= 3:
+        return 'endgame'
+    if step < 3 and fainted == 0:
+        return 'early'
+    return 'mid'
+
+def build_corpus(path: str = CORPUS_PATH, per_category: int = 25, n_battles: int = 40, seed: int = CORPUS_SEED) -> np.ndarray:
+    # self-play between Greedy and Mixed2 on a seeded roster, every position recorded and then
+    # sampled (seeded) per category
+    from BattleRecorder import TrajectoryReader, record_battle
+    from vgc.competition.Competitor import CompetitorManager
+    from vgc.util.generator.PkmRosterGenerators import RandomPkmRosterGenerator
+    from vgc.util.generator.PkmTeamGenerators import RandomTeamFromRoster
+
+    random.seed(seed)
+    np.random.seed(seed)
+    roster = RandomPkmRosterGenerator().gen_roster()
+    tg = RandomTeamFromRoster(roster)
+    pools: Dict[str, list] = {c: [] for c in CATEGORIES}
+    with tempfile.TemporaryDirectory() as tmp:
+        for b in range(n_battles):
+            cm0 = CompetitorManager(POLICIES['Greedy'].build_competitor())
+            cm1 = CompetitorManager(POLICIES['Mixed2'].build_competitor())
+            cm0.team = tg.get_team()
+            cm1.team = tg.get_team()
+            trajectory = os.path.join(tmp, f'{b}.fbtr')
+            record_battle(cm0, cm1, trajectory, seed + b)
+            cm0.competitor.battle_policy.close()
+            cm1.competitor.battle_policy.close()
+            reader = TrajectoryReader(trajectory)
+            for i in range(len(reader)):
+                rec = reader.records[i]
+                for side in range(2):
+                    state = np.array(rec['states'][side])
+                    if state['teams']['n_pkms'][0] == 0:
+                        continue
+                    pools[classify(state, int(rec['step']), int(rec['actions'][side]))].append((state, int(rec['step'])))
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for c, positions in pools.items():
+        for k in rng.permutation(len(positions))[:per_category]:
+            corpus.append((positions[k][0], CATEGORIES.index(c), positions[k][1]))
+    corpus = np.array(corpus, dtype=CORPUS_DTYPE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.save(path, corpus)
+    return corpus
+
+def load_corpus(path: str = CORPUS_PATH) -> np.ndarray:
+    if not os.path.exists(path):
+        print(f'Building corpus {path}...')
+        build_corpus(path)
+    return np.load(path, mmap_mode='r')
+
+def bench_policy(spec: ParticipantSpec, corpus: np.ndarray, mem_sample: int = 5) -> Dict:
+    policy = spec.build_policy()
+    latencies = []
+    nodes = []
+    by_category: Dict[str, List[float]] = {c: [] for c in CATEGORIES}
+    for i, rec in enumerate(corpus):
+        g = decode_state(rec['state'])
+        random.seed(i)
+        policy.nodes = 0
+        start = time.perf_counter()
+        policy.get_action(g)
+        elapsed = time.perf_counter() - start
+        latencies.append(elapsed)
+        nodes.append(getattr(policy, 'nodes', 0))
+        by_category[CATEGORIES[rec['category']]].append(elapsed)
+    selective_stats = dict(getattr(policy, 'selective_stats', {}))
+    # tracemalloc slows everything down, the peak is measured in a separate pass on a few positions
+    peak = 0
+    for i, rec in enumerate(corpus[::max(1, len(corpus) // mem_sample)]):
+        g = decode_state(rec['state'])
+        random.seed(i)
+        tracemalloc.start()
+        policy.get_action(g)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    policy.close()
+    latencies = np.array(latencies)
+    total = latencies.sum()
+    return {
+        'decisions_per_s': len(latencies) / total,
+        'p50_ms': float(np.percentile(latencies, 50) * 1e3),
+        'p99_ms': float(np.percentile(latencies, 99) * 1e3),
+        'nodes_per_s': float(np.sum(nodes) / total),
+        'nodes_per_decision': float(np.mean(nodes)),
+        'selective_stats': selective_stats,
+        'peak_mem_kb': peak / 1024,
+        'p50_ms_by_category': {c: float(np.percentile(v, 50) * 1e3) for c, v in by_category.items() if len(v) > 0},
+    }
+
+def current_commit() -> str:
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD', '--', 'bots'])
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def find_baseline(commit: str, baseline: str = None):
+    if baseline is not None:
+        path = baseline if os.path.exists(baseline) else os.path.join(RESULTS_DIR, f'{baseline}.json')
+        return path if os.path.exists(path) else None
+    others = [p for p in glob.glob(os.path.join(RESULTS_DIR, '*.json')) if os.path.basename(p) != f'{commit}.json']
+    return max(others, key=os.path.getmtime) if others else None
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    regressions = []
+    for name, res in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        if res['p50_ms'] > old['p50_ms'] * (1 + threshold):
+            regressions.append(f"{name}: p50 {old['p50_ms']:.2f} -> {res['p50_ms']:.2f} ms")
+        if res['decisions_per_s'] < old['decisions_per_s'] * (1 - threshold):
+            regressions.append(f"{name}: {old['decisions_per_s']:.1f} -> {res['decisions_per_s']:.1f} decisions/s")
+    return regressions
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Time get_action of the battle policies over a fixed corpus of positions.')
+    parser.add_argument('-p', '--policies', nargs='+', default=list(POLICIES), choices=list(POLICIES))
+    parser.add_argument('--corpus', default=CORPUS_PATH)
+    parser.add_argument('--build-corpus', action='store_true', help='regenerate the corpus (same seed, same positions)')
+    parser.add_argument('--baseline', help='commit or results file to compare with (default: latest stored result)')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative slowdown reported as a regression')
+    args = parser.parse_args(argv)
+
+    corpus = build_corpus(args.corpus) if args.build_corpus else load_corpus(args.corpus)
+    print(f'Corpus: {len(corpus)} positions')
+    results = {}
+    for name in args.policies:
+        results[name] = bench_policy(POLICIES[name], corpus)
+        r = results[name]
+        print(f"{name:<12} {r['decisions_per_s']:>10.1f} dec/s  p50 {r['p50_ms']:>9.2f} ms  p99 {r['p99_ms']:>9.2f} ms  "
+              f"{r['nodes_per_s']:>10.0f} nodes/s  peak {r['peak_mem_kb']:>9.0f} KB")
+
+    commit = current_commit()
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    baseline_path = find_baseline(commit, args.baseline)
+    with open(os.path.join(RESULTS_DIR, f'{commit}.json'), 'w') as f:
+        json.dump(results, f, indent=2)
+    if baseline_path is not None:
+        with open(baseline_path) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        print(f'Compared with {baseline_path}')
+        for r in regressions:
+            print(f'REGRESSION {r}')
+        if regressions:
+            raise SystemExit(1)
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,289 @@
+import argparse
+import ipaddress
+import multiprocessing
+import os
+import secrets
+import socket
+import threading
+import time
+import traceback
+from collections import deque
+from multiprocessing.managers import BaseManager
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+# the broker unpickles whatever a client sends, so the authkey is a secret: there is no default
+AUTHKEY_ENV = 'FBOTS_AUTHKEY'
+LEASE_TIMEOUT = 60.
+HEARTBEAT_INTERVAL = 5.
+
+class TaskBoard():
+    # lives in the broker server process and is used by the coordinator and the workers through
+    # BaseManager proxies; every task handed out is leased to a worker and goes back in the queue
+    # if the worker stops sending heartbeats
+
+    def __init__(self, max_attempts: int = 3):
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._queue = deque()
+        self._payloads: Dict[int, Any] = {}
+        self._leases: Dict[int, str] = {}
+        self._attempts: Dict[int, int] = {}
+        self._heartbeats: Dict[str, float] = {}
+        self._results: Dict[int, Any] = {}
+        self._failed: Dict[int, str] = {}
+        self._closed = False
+
+    def add_task(self, task_id: int, payload: Any) -> None:
+        with self._lock:
+            self._payloads[task_id] = payload
+            self._attempts[task_id] = 0
+            self._queue.append(task_id)
+
+    def get_task(self, worker_id: str):
+        with self._lock:
+            self._heartbeats[worker_id] = time.monotonic()
+            if not self._queue:
+                return None
+            task_id = self._queue.popleft()
+            self._leases[task_id] = worker_id
+            self._attempts[task_id] += 1
+            return task_id, self._payloads[task_id]
+
+    def heartbeat(self, worker_id: str) -> bool:
+        # returns False once the coordinator does not need this worker anymore
+        with self._lock:
+            self._heartbeats[worker_id] = time.monotonic()
+            return not self._closed
+
+    def put_result(self, worker_id: str, task_id: int, result: Any) -> None:
+        with self._lock:
+            # a late result from a worker whose lease expired is still valid, keep the first one
+            if task_id in self._results or task_id in self._failed:
+                return
+            self._results[task_id] = result
+            self._leases.pop(task_id, None)
+            if task_id in self._queue:
+                self._queue.remove(task_id)
+
+    def put_error(self, worker_id: str, task_id: int, error: str) -> None:
+        with self._lock:
+            if self._leases.get(task_id) != worker_id:
+                return
+            del self._leases[task_id]
+            self._retry(task_id, error)
+
+    def requeue_expired(self, timeout: float = LEASE_TIMEOUT) -> List[int]:
+        now = time.monotonic()
+        requeued = []
+        with self._lock:
+            for task_id, worker_id in list(self._leases.items()):
+                if now - self._heartbeats.get(worker_id, 0.) > timeout:
+                    del self._leases[task_id]
+                    self._retry(task_id, f'worker {worker_id} lost')
+                    requeued.append(task_id)
+        return requeued
+
+    def _retry(self, task_id: int, reason: str) -> None:
+        # max_attempts is the total number of attempts a task gets
+        if self._attempts[task_id] >= self.max_attempts:
+            self._failed[task_id] = reason
+        else:
+            self._queue.append(task_id)
+
+    def done(self) -> bool:
+        with self._lock:
+            return len(self._results) + len(self._failed) == len(self._payloads)
+
+    def results(self) -> Dict[int, Any]:
+        with self._lock:
+            return dict(self._results)
+
+    def failed(self) -> Dict[int, str]:
+        with self._lock:
+            return dict(self._failed)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+
+    def closed(self) -> bool:
+        with self._lock:
+            return self._closed
+
+class BrokerManager(BaseManager):
+    pass
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+_board: TaskBoard = None
+
+def _shared_board() -> TaskBoard:
+    # in the broker server process: the same board for every connection
+    global _board
+    if _board is None:
+        _board = TaskBoard()
+    return _board
+
+def is_loopback(host: str) -> bool:
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def get_authkey(authkey: str = None) -> Union[bytes, None]:
+    # --authkey, else the FBOTS_AUTHKEY environment variable
+    authkey = authkey or os.environ.get(AUTHKEY_ENV)
+    return authkey.encode() if authkey else None
+
+def coordinator_authkey(host: str, authkey: bytes = None) -> bytes:
+    # a broker reachable from other hosts needs an explicit key; on loopback a random one is generated
+    # and printed for the local workers
+    if authkey:
+        return authkey
+    if not is_loopback(host):
+        raise ValueError(f'binding the broker to {host or "all interfaces"} needs an explicit authkey '
+                         f'(--authkey or {AUTHKEY_ENV})')
+    authkey = secrets.token_hex(16)
+    print(f'Broker authkey: {authkey}')
+    return authkey.encode()
+
+def serve_board(address: Tuple[str, int], authkey: bytes) -> BrokerManager:
+    # the board lives in a server process started here; manager.shutdown() stops it and frees the port
+    BrokerManager.register('board', callable=_shared_board)
+    manager = BrokerManager(address=address, authkey=authkey)
+    manager.start()
+    return manager
+
+def connect_board(address: Tuple[str, int], authkey: bytes, retries: int = 10):
+    BrokerManager.register('board')
+    manager = BrokerManager(address=address, authkey=authkey)
+    for attempt in range(retries):
+        try:
+            manager.connect()
+            return manager.board()
+        except (ConnectionRefusedError, OSError):
+            if attempt == retries - 1:
+                raise
+            time.sleep(1.)
+
+def run_worker(address: Tuple[str, int], authkey: bytes, handler: Callable = None, poll: float = 0.5):
+    if handler is None:
+        from Tournament import battle_pair
+        handler = battle_pair
+    worker_id = f'{socket.gethostname()}:{os.getpid()}'
+    board = connect_board(address, authkey)
+    stop = threading.Event()
+
+    def beat():
+        # own connection: manager proxies are not shared across threads. Without heartbeats the coordinator
+        # would requeue our tasks as if we were lost, so if the connection fails the whole worker stops
+        try:
+            hb_board = connect_board(address, authkey)
+        except Exception:
+            print(f'Worker {worker_id}: cannot send heartbeats, stopping\n{traceback.format_exc()}')
+            stop.set()
+            return
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                if not hb_board.heartbeat(worker_id):
+                    stop.set()
+            except (EOFError, OSError):
+                stop.set()
+
+    threading.Thread(target=beat, daemon=True).start()
+    n_tasks = 0
+    try:
+        while not stop.is_set():
+            try:
+                task = board.get_task(worker_id)
+            except (EOFError, OSError):
+                break
+            if task is None:
+                if board.closed():
+                    break
+                time.sleep(poll)
+                continue
+            task_id, payload = task
+            try:
+                result = handler(*payload)
+            except Exception:
+                board.put_error(worker_id, task_id, traceback.format_exc())
+                continue
+            board.put_result(worker_id, task_id, result)
+            n_tasks += 1
+    finally:
+        stop.set()
+    return n_tasks
+
+def run_tasks(payloads: List[Any], address: Tuple[str, int], authkey: bytes = None,
+              local_workers: int = 0, lease_timeout: float = LEASE_TIMEOUT, poll: float = 1.,
+              on_result: Callable = None, handler: Callable = None) -> List[Any]:
+    # coordinator: publish the tasks, wait for the results of remote (and optionally local) workers.
+    # authkey None is only accepted on a loopback address (see coordinator_authkey)
+    authkey = coordinator_authkey(address[0], authkey)
+    manager = serve_board(address, authkey)
+    try:
+        return _coordinate(manager.board(), payloads, address, authkey, local_workers, lease_timeout, poll,
+                           on_result, handler)
+    finally:
+        manager.shutdown()
+
+def _coordinate(board, payloads, address, authkey, local_workers, lease_timeout, poll, on_result, handler):
+    for task_id, payload in enumerate(payloads):
+        board.add_task(task_id, payload)
+    connect_address = ('127.0.0.1' if address[0] in ('', '0.0.0.0') else address[0], address[1])
+    workers = [multiprocessing.Process(target=run_worker, args=(connect_address, authkey, handler), daemon=True)
+               for _ in range(local_workers)]
+    for w in workers:
+        w.start()
+    seen = set()
+
+    def notify():
+        if on_result is not None:
+            for task_id, result in board.results().items():
+                if task_id not in seen:
+                    seen.add(task_id)
+                    on_result(task_id, result)
+
+    try:
+        while not board.done():
+            time.sleep(poll)
+            for task_id in board.requeue_expired(lease_timeout):
+                print(f'Task {task_id} requeued')
+            notify()
+        notify()
+    finally:
+        board.close()
+        for w in workers:
+            w.join(timeout=2 * HEARTBEAT_INTERVAL)
+    failed = board.failed()
+    if failed:
+        raise RuntimeError(f'{len(failed)} tasks failed: {failed}')
+    results = board.results()
+    return [results[i] for i in range(len(payloads))]
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Tournament worker: pulls battle tasks from a coordinator.')
+    parser.add_argument('address', help='coordinator address, host:port')
+    parser.add_argument('--authkey', help=f'the coordinator\'s authkey, by default from the {AUTHKEY_ENV} environment variable')
+    parser.add_argument('-j', '--processes', type=int, default=1, help='worker processes on this host')
+    args = parser.parse_args(argv)
+    address = parse_address(args.address)
+    authkey = get_authkey(args.authkey)
+    if authkey is None:
+        parser.error(f'an authkey is required: --authkey or {AUTHKEY_ENV}')
+    if args.processes == 1:
+        print(f'Worker done, {run_worker(address, authkey)} tasks')
+        return
+    procs = [multiprocessing.Process(target=run_worker, args=(address, authkey)) for _ in range(args.processes)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+if __name__=='__main__':
+    main()
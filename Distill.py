@@ -0,0 +1,135 @@
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import tempfile
+from typing import List
+
+import numpy as np
+
+from bots.DistilledEvaluator import fit_linear, fit_mlp, state_features, N_FEATURES
+from bots.DistilledPolicy import DEFAULT_MODEL_PATH, DistilledPolicy
+from bots.StateCodec import STATE_DTYPE, decode_state
+from TournamentConfig import ParticipantSpec
+
+# pipeline: self-play -> posizioni -> etichette dalla ricerca profonda -> modello numpy per DistilledPolicy
+
+SELF_PLAY = [
+    ParticipantSpec('Greedy', 'bots.GreedyPolicy:GreedyPolicy'),
+    ParticipantSpec('Mixed2', 'bots.MixedPolicy:MixedPolicy', [2]),
+    ParticipantSpec('AlphaBeta2', 'bots.AlphaBetaPolicy:AlphaBetaPolicy', [2]),
+]
+
+def generate_positions(n_battles: int, seed: int) -> np.ndarray:
+    from BattleRecorder import TrajectoryReader, record_battle
+    from vgc.competition.Competitor import CompetitorManager
+    from vgc.util.generator.PkmRosterGenerators import RandomPkmRosterGenerator
+    from vgc.util.generator.PkmTeamGenerators import RandomTeamFromRoster
+
+    random.seed(seed)
+    np.random.seed(seed)
+    roster = RandomPkmRosterGenerator().gen_roster()
+    tg = RandomTeamFromRoster(roster)
+    positions = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for b in range(n_battles):
+            spec0, spec1 = SELF_PLAY[b % len(SELF_PLAY)], SELF_PLAY[(b // len(SELF_PLAY)) % len(SELF_PLAY)]
+            cm0 = CompetitorManager(spec0.build_competitor())
+            cm1 = CompetitorManager(spec1.build_competitor())
+            cm0.team = tg.get_team()
+            cm1.team = tg.get_team()
+            trajectory = os.path.join(tmp, f'{b}.fbtr')
+            record_battle(cm0, cm1, trajectory, seed + b)
+            cm0.competitor.battle_policy.close()
+            cm1.competitor.battle_policy.close()
+            reader = TrajectoryReader(trajectory)
+            for i in range(len(reader)):
+                for side in range(2):
+                    state = reader.records[i]['states'][side]
+                    if state['teams']['n_pkms'][0] > 0:
+                        positions.append(np.array(state))
+    return np.array(positions, dtype=STATE_DTYPE)
+
+def _label(args):
+    state, depth, seed = args
+    from bots.AlphaBetaPolicy import AlphaBetaPolicy
+    # endgame disattivato: i valori dei finali risolti (+-WIN_VALUE) sono su un'altra scala
+    policy = AlphaBetaPolicy(depth, seed, endgame=False)
+    g = decode_state(state)
+    # le feature prima della ricerca, get_action stima le mosse avversarie modificando lo stato
+    x = state_features(g)
+    random.seed(seed)
+    action = policy.get_action(g)
+    policy.close()
+    # last_value contiene la penalità di profondità delle foglie (-weights['depth'] * ceil(depth / 2)): la tolgo,
+    # così l'etichetta è sulla scala di game_state_eval a profondità 0. Le linee che finiscono prima
+    # dell'orizzonte (ko) mantengono il vantaggio della loro penalità più piccola
+    return x, policy.last_value + policy.weights['depth'] * math.ceil(depth / 2), action
+
+def label_positions(positions: np.ndarray, depth: int, seed: int, processes: int = None):
+    # la posizione i è etichettata con il seed seed + i; restituisce feature, valori e azioni della ricerca
+    tasks = [(positions[i], depth, seed + i) for i in range(len(positions))]
+    with multiprocessing.Pool(processes) as pool:
+        labelled = pool.map(_label, tasks, chunksize=16)
+    X = np.array([x for x, _, _ in labelled], dtype=np.float32).reshape(-1, N_FEATURES)
+    y = np.array([v for _, v, _ in labelled], dtype=np.float64)
+    actions = np.array([a for _, _, a in labelled], dtype=np.int64)
+    return X, y, actions
+
+def agreement(model, positions: np.ndarray, actions: np.ndarray, seeds: np.ndarray) -> float:
+    # quota di posizioni in cui DistilledPolicy con `model` sceglie l'azione della ricerca che le ha etichettate
+    # (stesso seed, quindi stesse stime delle mosse avversarie)
+    policy = DistilledPolicy(model=model)
+    agree = 0
+    for state, action, seed in zip(positions, actions, seeds):
+        random.seed(int(seed))
+        agree += policy.get_action(decode_state(state)) == action
+    return agree / max(len(positions), 1)
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Distill the deep search into a fast numpy evaluator.')
+    parser.add_argument('--battles', type=int, default=200, help='self-play battles used to collect positions')
+    parser.add_argument('--label-depth', type=int, default=4, help='AlphaBeta depth used to label the positions')
+    parser.add_argument('--dataset', default='distill_dataset.npz', help='labelled positions, reused if it exists')
+    parser.add_argument('--model', choices=['linear', 'mlp'], default='mlp')
+    parser.add_argument('--hidden', type=int, default=32)
+    parser.add_argument('--epochs', type=int, default=300)
+    parser.add_argument('-o', '--output', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-j', '--processes', type=int)
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.dataset):
+        with np.load(args.dataset) as f:
+            X, y, positions, actions, seeds = f['X'], f['y'], f['positions'], f['actions'], f['seeds']
+            label_depth = int(f['label_depth'])
+        print(f'Loaded {len(X)} positions labelled at depth {label_depth} from {args.dataset}')
+    else:
+        label_depth = args.label_depth
+        positions = generate_positions(args.battles, args.seed)
+        print(f'{len(positions)} positions from {args.battles} battles, labelling at depth {label_depth}...')
+        X, y, actions = label_positions(positions, label_depth, args.seed, args.processes)
+        seeds = args.seed + np.arange(len(positions))
+        np.savez(args.dataset, X=X, y=y, positions=positions, actions=actions, seeds=seeds, label_depth=label_depth)
+
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(len(X))
+    n_val = len(X) // 10
+    val, train = order[:n_val], order[n_val:]
+    if args.model == 'linear':
+        model = fit_linear(X[train], y[train])
+    else:
+        model = fit_mlp(X[train], y[train], hidden=args.hidden, epochs=args.epochs, seed=args.seed)
+    mse = float(np.mean((model.predict(X[val]) - y[val])**2))
+    print(f'Validation mse: {mse:.4f} (label variance {float(np.var(y[val])):.4f})')
+    # l'obiettivo è giocare come la ricerca profonda: stessa azione sulle posizioni tenute da parte
+    print(f'Validation agreement with the depth-{label_depth} search: '
+          f'{agreement(model, positions[val], actions[val], seeds[val]):.1%}')
+    # il modello finale usa tutte le posizioni
+    model = fit_linear(X, y) if args.model == 'linear' else fit_mlp(X, y, hidden=args.hidden, epochs=args.epochs, seed=args.seed)
+    model.save(args.output)
+    print(f'Model saved to {args.output}')
+
+if __name__=='__main__':
+    main()
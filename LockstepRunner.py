@@ -0,0 +1,66 @@
+from copy import deepcopy
+from typing import List, Sequence, Tuple
+
+from vgc.behaviour import BattlePolicy
+from vgc.competition.BattleMatch import BattleMatch
+from vgc.competition.Competitor import Competitor, CompetitorManager
+from vgc.datatypes.Objects import GameState, PkmFullTeam, PkmTeam, get_full_team_view
+from vgc.engine.PkmBattleEnv import PkmBattleEnv
+
+# advances N independent battles one turn at a time: at every turn each policy receives the states of
+# all running battles together, through get_actions(batch) when it has one, so that fast policies can
+# serve the whole batch in one numpy pass. Everything else follows BattleMatch: the observation encoding
+# each policy asks for, the opponent team view given to team selection, and a match is a series of games
+
+def batch_actions(policy: BattlePolicy, states: List[GameState]) -> List[int]:
+    if hasattr(policy, 'get_actions'):
+        return list(policy.get_actions(states))
+    return [policy.get_action(s) for s in states]
+
+def run_lockstep(policies: Tuple[BattlePolicy, BattlePolicy], team_pairs: Sequence[Tuple[PkmTeam, PkmTeam]],
+                 debug: bool = False, max_turns: int = 500) -> List[int]:
+    # returns the winner (0, 1, or -1 if max_turns is reached) of every battle
+    encode = (policies[0].requires_encode(), policies[1].requires_encode())
+    envs = [PkmBattleEnv((deepcopy(t0), deepcopy(t1)), debug=debug, encode=encode) for t0, t1 in team_pairs]
+    obs = [env.reset()[0] for env in envs]
+    winners = [-1] * len(envs)
+    running = list(range(len(envs)))
+    turn = 0
+    while running and turn < max_turns:
+        a0 = batch_actions(policies[0], [obs[i][0] for i in running])
+        a1 = batch_actions(policies[1], [obs[i][1] for i in running])
+        still_running = []
+        for i, act0, act1 in zip(running, a0, a1):
+            s, _, terminal, _, _ = envs[i].step([act0, act1])
+            obs[i] = s
+            if terminal:
+                winners[i] = envs[i].winner
+            else:
+                still_running.append(i)
+        running = still_running
+        turn += 1
+    return winners
+
+def select_battle_team(competitor: Competitor, team: PkmFullTeam, opp_team: PkmFullTeam) -> PkmTeam:
+    # like BattleMatch, team selection only sees the view of the opponent team
+    ids = list(competitor.team_selection_policy.get_action((team, get_full_team_view(opp_team))))
+    return team.get_battle_team(ids)
+
+def run_lockstep_match(c0: Competitor, c1: Competitor, team0: PkmFullTeam, team1: PkmFullTeam, n_matches: int,
+                       debug: bool = False) -> List[int]:
+    # n_matches BattleMatch.run() in a row between the same two full teams, with the games of all the matches
+    # played together; returns the winner of each match like BattleMatch.winner() (-1 if it stays tied on draws)
+    n_games = BattleMatch(CompetitorManager(c0), CompetitorManager(c1), debug=debug).n_games
+    wins = [[0, 0] for _ in range(n_matches)]
+    pending = [m for m in range(n_matches) for _ in range(n_games)]
+    while pending:
+        pairs = [(select_battle_team(c0, team0, team1), select_battle_team(c1, team1, team0)) for _ in pending]
+        winners = run_lockstep((c0.battle_policy, c1.battle_policy), pairs, debug)
+        for m, winner in zip(pending, winners):
+            if winner >= 0:
+                wins[m][winner] += 1
+        if all(winner < 0 for winner in winners):
+            break
+        # tied matches go on one game at a time
+        pending = [m for m, (w0, w1) in enumerate(wins) if w0 == w1]
+    return [-1 if w0 == w1 else int(w1 > w0) for w0, w1 in wins]
@@ -0,0 +1,169 @@
+import math
+from itertools import combinations
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# Glicko-1 (Glickman, 1999) ratings, updated once per rating period (one round of pairs).
+# Glicko is used for the standings; whether two competitors are separated is decided on a Bradley-Terry fit
+# of all the head-to-head results, whose standard errors keep shrinking with the games played (the Glicko RD
+# stops at MIN_RD, so equal competitors would drift apart until they look separated)
+Q = math.log(10) / 400
+INITIAL_RATING = 1500.
+INITIAL_RD = 350.
+MIN_RD = 30.
+# default adaptive budget, in round-robins: equal competitors are never settled, so the budget must be finite
+DEFAULT_BUDGET_ROUND_ROBINS = 10
+
+def _g(rd: float) -> float:
+    return 1 / math.sqrt(1 + 3 * Q**2 * rd**2 / math.pi**2)
+
+def _expected(r: float, r_opp: float, rd_opp: float) -> float:
+    return 1 / (1 + 10 ** (-_g(rd_opp) * (r - r_opp) / 400))
+
+def _phi(x: float) -> float:
+    return 0.5 * (1 + math.erf(x / math.sqrt(2)))
+
+class Rating():
+
+    def __init__(self, rating: float = INITIAL_RATING, rd: float = INITIAL_RD):
+        self.rating = rating
+        self.rd = rd
+        self.n_battles = 0
+
+    def __repr__(self):
+        return f'Rating(rating: {self.rating:.1f}, rd: {self.rd:.1f}, battles: {self.n_battles})'
+
+class Ratings():
+
+    def __init__(self, names: Iterable[str], min_rd: float = MIN_RD):
+        self.min_rd = min_rd
+        self.r: Dict[str, Rating] = {name: Rating() for name in names}
+        self.names = list(self.r)
+        self.wins = np.zeros((len(self.names), len(self.names)))
+        self._bt = None
+
+    def update(self, results: List[Tuple[str, int, str, int]]) -> None:
+        # results: (name_i, wins_i, name_j, wins_j) of one rating period; every battle is one game
+        games: Dict[str, List[Tuple[str, float]]] = {name: [] for name in self.r}
+        index = {name: k for k, name in enumerate(self.names)}
+        for name_i, wins_i, name_j, wins_j in results:
+            self.wins[index[name_i], index[name_j]] += wins_i
+            self.wins[index[name_j], index[name_i]] += wins_j
+            games[name_i] += [(name_j, 1.)] * wins_i + [(name_j, 0.)] * wins_j
+            games[name_j] += [(name_i, 1.)] * wins_j + [(name_i, 0.)] * wins_i
+        new = {}
+        for name, played in games.items():
+            me = self.r[name]
+            if len(played) == 0:
+                continue
+            d_inv = 0.
+            delta = 0.
+            for opp_name, score in played:
+                opp = self.r[opp_name]
+                g = _g(opp.rd)
+                e = _expected(me.rating, opp.rating, opp.rd)
+                d_inv += g**2 * e * (1 - e)
+                delta += g * (score - e)
+            d_inv *= Q**2
+            denom = 1 / me.rd**2 + d_inv
+            new[name] = (me.rating + Q / denom * delta, max(math.sqrt(1 / denom), self.min_rd), len(played))
+        for name, (rating, rd, n) in new.items():
+            self.r[name].rating = rating
+            self.r[name].rd = rd
+            self.r[name].n_battles += n
+        self._bt = None
+
+    def expected(self, name_i: str, name_j: str) -> float:
+        return _expected(self.r[name_i].rating, self.r[name_j].rating, self.r[name_j].rd)
+
+    def overlap(self, name_i: str, name_j: str) -> float:
+        # probability that the current order of i and j is wrong
+        a, b = self.r[name_i], self.r[name_j]
+        return _phi(-abs(a.rating - b.rating) / math.sqrt(a.rd**2 + b.rd**2))
+
+    def bradley_terry(self, iterations: int = 50) -> Tuple[np.ndarray, np.ndarray]:
+        # maximum likelihood strengths (natural log scale, in the order of self.names) and their covariance.
+        # Every competitor also gets one virtual win and one virtual loss against a strength 0 player, so the
+        # fit exists when someone won or lost every game and the information matrix is always invertible
+        if self._bt is None:
+            games = self.wins + self.wins.T
+            theta = np.zeros(len(self.names))
+            for _ in range(iterations):
+                info, grad = self._bt_terms(theta, games)
+                step = np.linalg.solve(info, grad)
+                theta = theta + step
+                if np.abs(step).max() < 1e-9:
+                    break
+            info, _ = self._bt_terms(theta, games)
+            self._bt = (theta, np.linalg.inv(info))
+        return self._bt
+
+    def _bt_terms(self, theta: np.ndarray, games: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Fisher information and gradient of the log-likelihood (prior included)
+        p = 1 / (1 + np.exp(theta[None, :] - theta[:, None]))
+        prior = 1 / (1 + np.exp(-theta))
+        w = games * p * (1 - p)
+        info = np.diag(w.sum(axis=1) + 2 * prior * (1 - prior)) - w
+        grad = (self.wins - games * p).sum(axis=1) + 1 - 2 * prior
+        return info, grad
+
+    def separation(self, name_i: str, name_j: str) -> float:
+        # probability that the Bradley-Terry order of i and j is wrong
+        theta, cov = self.bradley_terry()
+        i, j = self.names.index(name_i), self.names.index(name_j)
+        se = math.sqrt(max(cov[i, i] + cov[j, j] - 2 * cov[i, j], 1e-12))
+        return _phi(-abs(theta[i] - theta[j]) / se)
+
+    def standings(self) -> List[Tuple[str, Rating]]:
+        return sorted(self.r.items(), key=lambda x: x[1].rating, reverse=True)
+
+class AdaptiveScheduler():
+    # instead of playing every pair the same number of times, each round plays the pairs
+    # whose relative rank is still uncertain, each competitor at most once per round.
+    # The separation is tested again after every round, so the error probability is spent over the rounds:
+    # after round k a pair is settled below min_overlap / (k * (k + 1)), and these add up to min_overlap.
+    # Competitors of equal strength stay unsettled until the budget is spent
+
+    def __init__(self, names: Iterable[str], budget: int = None, min_overlap: float = 0.05, ratings: Ratings = None):
+        # budget: maximum number of pair matches (None: DEFAULT_BUDGET_ROUND_ROBINS round-robins);
+        # min_overlap: chance of ever settling a pair in the wrong order
+        self.names = list(names)
+        self.ratings = ratings or Ratings(self.names)
+        n_pairs = len(self.names) * (len(self.names) - 1) // 2
+        self.budget = budget if budget is not None else DEFAULT_BUDGET_ROUND_ROBINS * n_pairs
+        self.min_overlap = min_overlap
+        self.played = 0
+        self.rounds = 0
+
+    def threshold(self) -> float:
+        k = max(self.rounds, 1)
+        return self.min_overlap / (k * (k + 1))
+
+    def next_pairs(self, max_pairs: int) -> List[Tuple[str, str]]:
+        max_pairs = min(max_pairs, self.budget - self.played)
+        threshold = self.threshold()
+        candidates = []
+        for i, j in combinations(self.names, 2):
+            p = self.ratings.separation(i, j)
+            if p >= threshold:
+                candidates.append((p, i, j))
+        candidates.sort(reverse=True)
+        busy = set()
+        pairs = []
+        for _, i, j in candidates:
+            if len(pairs) >= max_pairs:
+                break
+            if i in busy or j in busy:
+                continue
+            busy.update((i, j))
+            pairs.append((i, j))
+        return pairs
+
+    def report(self, results: List[Tuple[str, int, str, int]]) -> None:
+        self.played += len(results)
+        self.rounds += 1
+        self.ratings.update(results)
+
+    def finished(self) -> bool:
+        return len(self.next_pairs(1)) == 0
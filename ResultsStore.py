@@ -0,0 +1,126 @@
+import csv
+import os
+import sqlite3
+from typing import List, Tuple
+
+# ogni risultato viene solo accodato, gli aggregati per accoppiamento sono mantenuti
+# come somme correnti e aggiornati nella stessa transazione (O(1) per risultato)
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  our_policy TEXT NOT NULL,
+  opp_policy TEXT NOT NULL,
+  max_depth REAL NOT NULL,
+  perc_matches_wins REAL NOT NULL,
+  competitions_wins REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS aggregates (
+  opp_policy TEXT NOT NULL,
+  our_policy TEXT NOT NULL,
+  max_depth REAL NOT NULL,
+  number_of_tests INTEGER NOT NULL,
+  sum_perc_matches_wins REAL NOT NULL,
+  sum_comp_wins REAL NOT NULL,
+  PRIMARY KEY (opp_policy, our_policy, max_depth)
+);
+"""
+
+_UPSERT = """
+INSERT INTO aggregates VALUES (?, ?, ?, 1, ?, ?)
+ON CONFLICT (opp_policy, our_policy, max_depth) DO UPDATE SET
+  number_of_tests = number_of_tests + 1,
+  sum_perc_matches_wins = sum_perc_matches_wins + excluded.sum_perc_matches_wins,
+  sum_comp_wins = sum_comp_wins + excluded.sum_comp_wins
+"""
+
+AGGREGATE_COLUMNS = ["opp_policy", "our_policy", "max_depth", "mean_perc_matches_wins", "number_of_tests", "mean_comp_wins"]
+RESULT_COLUMNS = ["our_policy", "opp_policy", "max_depth", "%_matches_wins", "competitions_wins"]
+
+class ResultsStore():
+
+  def __init__(self, path: str = 'results.db', timeout: float = 30.):
+    # timeout: quanto aspettare il lock se un altro tester sta scrivendo
+    self.path = path
+    self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    self.conn.execute('PRAGMA journal_mode=WAL')
+    self.conn.executescript(_SCHEMA)
+
+  def add_result(self, our_policy: str, opp_policy: str, max_depth: float, perc_wins: float, comp_wins: float) -> None:
+    self.add_results([(our_policy, opp_policy, max_depth, perc_wins, comp_wins)])
+
+  def add_results(self, rows: List[Tuple[str, str, float, float, float]]) -> None:
+    self._transaction(lambda: self._insert(rows))
+
+  def _transaction(self, body):
+    # BEGIN IMMEDIATE prende subito il lock in scrittura, così tester concorrenti si serializzano
+    self.conn.execute('BEGIN IMMEDIATE')
+    try:
+      result = body()
+      self.conn.execute('COMMIT')
+      return result
+    except BaseException:
+      self.conn.execute('ROLLBACK')
+      raise
+
+  def _insert(self, rows: List[Tuple[str, str, float, float, float]]) -> None:
+    for our_policy, opp_policy, max_depth, perc_wins, comp_wins in rows:
+      max_depth = float(max_depth)
+      self.conn.execute(
+        'INSERT INTO results (our_policy, opp_policy, max_depth, perc_matches_wins, competitions_wins) VALUES (?, ?, ?, ?, ?)',
+        (our_policy, opp_policy, max_depth, perc_wins, comp_wins))
+      self.conn.execute(_UPSERT, (opp_policy, our_policy, max_depth, perc_wins, comp_wins))
+
+  def aggregates(self) -> List[Tuple[str, str, float, float, int, float]]:
+    return self.conn.execute(
+      'SELECT opp_policy, our_policy, max_depth, sum_perc_matches_wins/number_of_tests, number_of_tests, sum_comp_wins/number_of_tests '
+      'FROM aggregates ORDER BY opp_policy, our_policy, max_depth').fetchall()
+
+  def n_results(self) -> int:
+    return self.conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+  def import_csv(self, path: str = 'results.csv') -> int:
+    # importa lo storico in formato results.csv (solo se lo store è ancora vuoto: altrimenti il file non
+    # viene neanche letto)
+    if self.n_results() > 0 or not os.path.exists(path):
+      return 0
+    # alcune righe storiche di Greedy non hanno la profondità: per Greedy vale 0
+    with open(path, newline='') as f:
+      rows = [(r["our_policy"], r["opp_policy"], float(r["max_depth"] or 0), float(r["%_matches_wins"]), float(r["competitions_wins"]))
+              for r in csv.DictReader(f)]
+    # controllo e inserimento nella stessa transazione: due tester avviati insieme non importano due volte
+    def body() -> int:
+      if self.n_results() > 0:
+        return 0
+      self._insert(rows)
+      return len(rows)
+    return self._transaction(body)
+
+  def export_results(self, path: str = 'results.csv') -> None:
+    rows = self.conn.execute(
+      'SELECT our_policy, opp_policy, max_depth, perc_matches_wins, competitions_wins FROM results '
+      'ORDER BY our_policy, max_depth, opp_policy, id').fetchall()
+    _write_csv(path, RESULT_COLUMNS, rows)
+
+  def export_aggregates(self, path: str = 'risultati_aggregati.csv') -> None:
+    _write_csv(path, AGGREGATE_COLUMNS, self.aggregates())
+
+  def close(self) -> None:
+    self.conn.close()
+
+def append_result_csv(path: str, row: Tuple[str, str, float, float, float]) -> None:
+  # accoda un risultato a results.csv (con l'intestazione se il file non c'è ancora), senza riscriverlo
+  new = not os.path.exists(path)
+  with open(path, 'a', newline='') as f:
+    writer = csv.writer(f)
+    if new:
+      writer.writerow(RESULT_COLUMNS)
+    writer.writerow(row)
+
+def _write_csv(path: str, columns: List[str], rows) -> None:
+  # scrivo su un file temporaneo e poi rinomino, così i lettori non vedono mai un csv a metà
+  tmp = f'{path}.{os.getpid()}.tmp'
+  with open(tmp, 'w', newline='') as f:
+    writer = csv.writer(f)
+    writer.writerow(columns)
+    writer.writerows(rows)
+  os.replace(tmp, path)
@@ -0,0 +1,186 @@
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+from vgc.behaviour import BattlePolicy, TeamSelectionPolicy, TeamBuildPolicy
+from vgc.competition.Competitor import Competitor
+
+from LockstepRunner import batch_actions
+
+# live tournament metrics: the workers time every decision through TimingPolicy and send one event per
+# battle (or per lockstep batch) to the parent, which keeps battles/sec, ETA, per-policy decision latency
+# and per-worker utilisation, and rewrites them to a metrics file every few seconds
+
+DEFAULT_METRICS_PATH = 'tournament_metrics.json'
+
+def worker_id() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+class TimingPolicy(BattlePolicy):
+
+    def __init__(self, policy: BattlePolicy):
+        self.policy = policy
+        self.reset()
+
+    def reset(self) -> None:
+        self.total = 0.
+        self.calls = 0
+        self.max = 0.
+
+    def requires_encode(self) -> bool:
+        return self.policy.requires_encode()
+
+    def close(self):
+        self.policy.close()
+
+    def get_action(self, g) -> int:
+        start = time.perf_counter()
+        action = self.policy.get_action(g)
+        self._add(time.perf_counter() - start, 1)
+        return action
+
+    def get_actions(self, states) -> List[int]:
+        # a batch counts as len(states) decisions of the average duration
+        start = time.perf_counter()
+        actions = batch_actions(self.policy, states)
+        self._add(time.perf_counter() - start, len(states))
+        return actions
+
+    def _add(self, elapsed: float, n: int) -> None:
+        self.total += elapsed
+        self.calls += n
+        self.max = max(self.max, elapsed / max(n, 1))
+
+class TimingCompetitor(Competitor):
+
+    def __init__(self, competitor: Competitor):
+        self.competitor = competitor
+        self._battle_policy = TimingPolicy(competitor.battle_policy)
+
+    @property
+    def name(self):
+        return self.competitor.name
+
+    @property
+    def team_build_policy(self) -> TeamBuildPolicy:
+        return self.competitor.team_build_policy
+
+    @property
+    def team_selection_policy(self) -> TeamSelectionPolicy:
+        return self.competitor.team_selection_policy
+
+    @property
+    def battle_policy(self) -> TimingPolicy:
+        return self._battle_policy
+
+def battle_event(timers: List[Tuple[str, TimingPolicy]], duration: float, battles: int = 1) -> Dict[str, Any]:
+    # timers: (policy name, timer) of the battle(s) just played, side 0 first
+    policies: Dict[str, List[float]] = {}
+    for name, t in timers:
+        total, calls, worst = policies.get(name, [0., 0, 0.])
+        policies[name] = [total + t.total, calls + t.calls, max(worst, t.max)]
+    return {'worker': worker_id(), 'time': time.time(), 'duration': duration, 'battles': battles,
+            'turns': timers[0][1].calls, 'policies': policies}
+
+class TelemetryMonitor():
+
+    def __init__(self, path: str = DEFAULT_METRICS_PATH, total_battles: int = None, interval: float = 5.):
+        self.path = path
+        self.total_battles = total_battles
+        self.interval = interval
+        self.start_time = time.time()
+        self.battles = 0
+        self.turns = 0
+        self.policies: Dict[str, List[float]] = {}
+        self.workers: Dict[str, List[float]] = {}
+        self.lock = threading.Lock()
+        self._last_write = 0.
+        self._thread: threading.Thread = None
+        self._stop = threading.Event()
+
+    def record(self, event: Dict[str, Any]) -> None:
+        with self.lock:
+            self.battles += event['battles']
+            self.turns += event['turns']
+            for name, (total, calls, worst) in event['policies'].items():
+                p = self.policies.setdefault(name, [0., 0, 0.])
+                p[0] += total
+                p[1] += calls
+                p[2] = max(p[2], worst)
+            w = self.workers.setdefault(event['worker'], [0., 0])
+            w[0] += event['duration']
+            w[1] += event['battles']
+
+    def metrics(self) -> Dict[str, Any]:
+        with self.lock:
+            elapsed = max(time.time() - self.start_time, 1e-9)
+            rate = self.battles / elapsed
+            eta = None
+            if self.total_battles is not None and rate > 0:
+                eta = max(self.total_battles - self.battles, 0) / rate
+            return {
+                'elapsed': round(elapsed, 1),
+                'battles': self.battles,
+                'total_battles': self.total_battles,
+                'battles_per_sec': round(rate, 3),
+                'eta': None if eta is None else round(eta, 1),
+                'turns_per_battle': round(self.turns / self.battles, 1) if self.battles else None,
+                'policies': {name: {'decisions': calls, 'avg_ms': round(1000 * total / max(calls, 1), 3),
+                                    'max_ms': round(1000 * worst, 3), 'total_s': round(total, 2)}
+                             for name, (total, calls, worst) in sorted(self.policies.items(), key=lambda p: -p[1][0])},
+                'workers': {w: {'battles': n, 'busy_s': round(busy, 1), 'utilisation': round(min(busy / elapsed, 1.), 3)}
+                            for w, (busy, n) in sorted(self.workers.items())},
+            }
+
+    def summary(self, m: Dict[str, Any] = None) -> str:
+        m = m or self.metrics()
+        total = f"/{m['total_battles']}" if m['total_battles'] is not None else ''
+        eta = f", ETA {m['eta']:.0f}s" if m['eta'] is not None else ''
+        # policies are sorted by total decision time: the first one is the bottleneck
+        top = next(iter(m['policies'].items()), None)
+        slow = f", most time in {top[0]} ({top[1]['avg_ms']:.1f}ms/decision)" if top else ''
+        return f"{m['battles']}{total} battles, {m['battles_per_sec']:.2f}/s{eta}{slow}"
+
+    def write(self) -> Dict[str, Any]:
+        m = self.metrics()
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(m, f, indent=2)
+        os.replace(tmp, self.path)
+        self._last_write = time.monotonic()
+        return m
+
+    def maybe_write(self) -> None:
+        if time.monotonic() - self._last_write >= self.interval:
+            print(self.summary(self.write()))
+
+    def start(self, events) -> None:
+        # drains a (manager) queue of events in a background thread
+        def drain():
+            while not self._stop.is_set():
+                try:
+                    self.record(events.get(timeout=0.5))
+                except queue.Empty:
+                    pass
+                self.maybe_write()
+            while True:
+                try:
+                    self.record(events.get_nowait())
+                except queue.Empty:
+                    break
+        self._stop.clear()
+        self._thread = threading.Thread(target=drain, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Dict[str, Any]:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        m = self.write()
+        print(self.summary(m))
+        return m
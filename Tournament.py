@@ -1,120 +1,230 @@
-import threading
-from tqdm import tqdm
+import argparse
+import os
+import random
+import time
+from typing import List
 
-from bots.AlphaBetaPolicy import AlphaBetaPolicy
-from bots.MixedPolicy import MixedPolicy
-from bots.GreedyPolicy import GreedyPolicy
-from bots.fCompetitor import fCompetitor
-from bots.Thunder_BattlePolicies import ThunderPlayer
-from bots.hayo5 import hayo5_BattlePolicy
+from BattleRecorder import record_battle
+from LockstepRunner import run_lockstep_match
+from Ratings import AdaptiveScheduler
+from Telemetry import DEFAULT_METRICS_PATH, TelemetryMonitor, TimingCompetitor, battle_event
+from Broker import AUTHKEY_ENV, coordinator_authkey, get_authkey, parse_address, run_tasks
+from TournamentConfig import ParticipantSpec, TournamentConfig, load_config
 
 from vgc.competition.BattleMatch import BattleMatch
 from vgc.competition.Competitor import CompetitorManager
 from vgc.util.generator.PkmRosterGenerators import RandomPkmRosterGenerator
 from vgc.util.generator.PkmTeamGenerators import RandomTeamFromRoster
 
-from vgc.behaviour.BattlePolicies import TerminalPlayer, Minimax, PrunedBFS
+import numpy as np
 import pandas as pd
 import multiprocessing
 from itertools import combinations
 
-def main():
-    c1 = fCompetitor('Player1') #Greedy
-    c2 = fCompetitor('Player2') #AlphaBeta (4.0)
-    c3 = fCompetitor('Player3') #Mixed (2.0)
-    c4 = fCompetitor('Player4') #Mixed (4.0)
-    c5 = fCompetitor('Player5') #PrunedBFS
-    c6 = fCompetitor('Player6') #MiniMax
-    c7 = fCompetitor('Player7') #Thunder
-    c8 = fCompetitor('Player8') #Hayo5
-    c9 = fCompetitor('Player9') #Mixed (6.0)
-    c10 = fCompetitor('Player10') #AlphaBeta (2.0)
-
-    #assing policies to competitors
-    c1._battle_policy = GreedyPolicy()
-    c2._battle_policy = AlphaBetaPolicy(4)
-    c3._battle_policy = MixedPolicy(2)
-    c4._battle_policy = MixedPolicy(4)
-    c5._battle_policy = PrunedBFS()
-    c6._battle_policy = Minimax()
-    c7._battle_policy = ThunderPlayer()
-    c8._battle_policy = hayo5_BattlePolicy()
-    c9._battle_policy = MixedPolicy(6)
-    c10._battle_policy = AlphaBetaPolicy(2)
-
-    cm1 = CompetitorManager(c1)
-    cm2 = CompetitorManager(c2)
-    cm3 = CompetitorManager(c3)
-    cm4 = CompetitorManager(c4)
-    cm5 = CompetitorManager(c5)
-    cm6 = CompetitorManager(c6)
-    cm7 = CompetitorManager(c7)
-    cm8 = CompetitorManager(c8)
-    cm9 = CompetitorManager(c9)
-    cm10 = CompetitorManager(c10)
-    
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Run a round-robin tournament between the policies declared in a config file.')
+    parser.add_argument('config', nargs='?', default='tournaments/config.json', help='tournament config (json)')
+    parser.add_argument('-o', '--output', help='standings csv, overrides "output" in the config')
+    parser.add_argument('-p', '--participants', nargs='+', help='only run these participants (by name)')
+    parser.add_argument('-n', '--n-battles', type=int, help='battles per side for each pair, overrides the config')
+    parser.add_argument('--seed', type=int, help='seed for roster and team generation, overrides the config')
+    parser.add_argument('--distributed', metavar='HOST:PORT', help='publish the battles on a broker at this address instead of using a local pool; '
+                        'workers are started with `python Broker.py HOST:PORT`')
+    parser.add_argument('--local-workers', type=int, default=0, help='with --distributed, also start this many workers on this host')
+    parser.add_argument('--adaptive', action='store_true', help='rating-based scheduling: play the pairs whose relative rank is still uncertain '
+                        'instead of a full round-robin, standings are Glicko ratings')
+    parser.add_argument('--budget', type=int, help='with --adaptive, maximum number of pair matches '
+                        '(default: 10 round-robins, competitors of equal strength are never settled)')
+    parser.add_argument('--record-dir', help='record every battle as a trajectory file in this directory')
+    parser.add_argument('--lockstep', action='store_true', help='play the battles of each side of a pair in lockstep, '
+                        'giving batches of states to policies with get_actions (no recording)')
+    parser.add_argument('--authkey', help=f'broker authkey, by default from the {AUTHKEY_ENV} environment variable; required unless '
+                        'the broker address is loopback, where a random key is generated')
+    parser.add_argument('--metrics', default=DEFAULT_METRICS_PATH, help='live metrics file (battles/sec, ETA, decision latency per policy, '
+                        'worker utilisation), rewritten during the run; empty to disable')
+    parser.add_argument('--metrics-interval', type=float, default=5., help='seconds between metrics updates')
+    args = parser.parse_args(argv)
+
+    config: TournamentConfig = load_config(args.config)
+    participants = config.participants
+    if args.participants:
+        unknown = set(args.participants) - {p.name for p in participants}
+        if unknown:
+            parser.error(f'unknown participants: {sorted(unknown)}')
+        participants = [p for p in participants if p.name in args.participants]
+    n_battles = args.n_battles if args.n_battles is not None else config.n_battles
+    seed = args.seed if args.seed is not None else config.seed
+    output = args.output or config.output
+
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
     roster = RandomPkmRosterGenerator().gen_roster()
     tg = RandomTeamFromRoster(roster)
 
-    cm1.team = tg.get_team()
-    cm2.team = tg.get_team()
-    cm3.team = tg.get_team()
-    cm4.team = tg.get_team()
-    cm5.team = tg.get_team()
-    cm6.team = tg.get_team()
-    cm7.team = tg.get_team()
-    cm8.team = tg.get_team()
-    cm9.team = tg.get_team()
-    cm10.team = tg.get_team()
-
-    T = Tournament([[cm1, "Greedy"], [cm2,"AlphaBeta4"], [cm5,"PrunedBFS"], 
-                     [cm7, "Thuder"],[cm8,"Hayo5"], [cm9,"Mixed6"]])
-    
-    results = T.start_tournament()
-    print(f"Results: {results}")
-    df = pd.DataFrame(list(results.items()), columns=['Policy', 'Score'])
-    standings = df.sort_values(["Score"], ascending=False).reset_index(drop=True)
+    if args.record_dir:
+        os.makedirs(args.record_dir, exist_ok=True)
+    if args.lockstep and args.record_dir:
+        parser.error('--lockstep battles cannot be recorded')
+    T = Tournament([[p, tg.get_team()] for p in participants], n_battles=n_battles, record_dir=args.record_dir,
+                   lockstep=args.lockstep, metrics=args.metrics or None, metrics_interval=args.metrics_interval)
+
+    if args.adaptive:
+        if args.distributed:
+            parser.error('--adaptive runs on the local pool only')
+        ratings = T.start_adaptive_tournament(budget=args.budget)
+        df = pd.DataFrame([[name, round(r.rating, 1), round(r.rd, 1), r.n_battles] for name, r in ratings.standings()],
+                          columns=['Policy', 'Rating', 'RD', 'Battles'])
+        standings = df.reset_index(drop=True)
+    else:
+        if args.distributed:
+            address = parse_address(args.distributed)
+            try:
+                authkey = coordinator_authkey(address[0], get_authkey(args.authkey))
+            except ValueError as e:
+                parser.error(str(e))
+            results = T.start_tournament(address=address, authkey=authkey, local_workers=args.local_workers)
+        else:
+            results = T.start_tournament()
+        print(f"Results: {results}")
+        df = pd.DataFrame(list(results.items()), columns=['Policy', 'Score'])
+        standings = df.sort_values(["Score"], ascending=False).reset_index(drop=True)
     standings.index = standings.index + 1
     print(standings)
-    standings.to_csv('tournament7.csv', index_label="Rank")
+    if output:
+        standings.to_csv(output, index_label="Rank")
 
-class Tournament():
+def battle_match(cm0: CompetitorManager, cm1: CompetitorManager, debug=False):
+    match = BattleMatch(cm0, cm1, debug=debug)
+    match.run()
+    return match.winner()
 
-    def __init__(self, competitors):
-        policies = [i[1] for i in competitors]
-        count = [0] * len(competitors)
-        self.results = dict(zip(policies, count))  
-        print(self.results)
-        self.c = competitors
-            
-    def battle_match(self, team1, team2, debug=False):
-        match = BattleMatch(team1, team2, debug=debug)
-        match.run()
-        return match.winner()
-    
-    def battle_worker(self, pair):
-        i, j = pair
+def battle_pair(spec_i: ParticipantSpec, team_i, spec_j: ParticipantSpec, team_j, n_battles: int = 5, record_dir: str = None,
+                lockstep: bool = False, events=None, return_events: bool = False):
+    # policies are built (and their modules imported) here, inside the worker process.
+    # Telemetry: one event per battle (per lockstep batch) is put on `events` (a manager queue) if given,
+    # and with return_events the events are also returned with the result, for workers without a queue
+    cm_i = CompetitorManager(TimingCompetitor(spec_i.build_competitor()))
+    cm_j = CompetitorManager(TimingCompetitor(spec_j.build_competitor()))
+    try:
+        timers = [(spec_i.name, cm_i.competitor.battle_policy), (spec_j.name, cm_j.competitor.battle_policy)]
+        played = []
+
+        def emit(start, battles=1):
+            event = battle_event(timers, time.perf_counter() - start, battles)
+            played.append(event)
+            if events is not None:
+                events.put(event)
+            for _, t in timers:
+                t.reset()
+
+        if lockstep:
+            winners = []
+            for t0, t1 in ((team_i, team_j), (team_j, team_i)):
+                start = time.perf_counter()
+                winners += run_lockstep_match(cm_i.competitor, cm_j.competitor, t0, t1, n_battles)
+                emit(start, n_battles)
+            result = [spec_i.name, winners.count(0)], [spec_j.name, winners.count(1)]
+            return result + (played,) if return_events else result
+        cm_i.team = team_i
+        cm_j.team = team_j
         wins_i = 0
         wins_j = 0
-        for _ in range(2):  
-            for _ in range(5):  
-                winner = self.battle_match(i[0], j[0])
+        for _ in range(2):
+            for _ in range(n_battles):
+                start = time.perf_counter()
+                if record_dir is None:
+                    winner = battle_match(cm_i, cm_j)
+                else:
+                    seed = random.randrange(2**31)
+                    winner = record_battle(cm_i, cm_j, os.path.join(record_dir, f'{spec_i.name}-{spec_j.name}-{seed}.fbtr'), seed)
+                emit(start)
                 if winner == 0:
                     wins_i += 1
                 elif winner == 1:
                     wins_j += 1
             #switch teams
-            i[0].team, j[0].team = j[0].team, i[0].team
-        print("Match finished")
-        return([i[1],wins_i], [j[1],wins_j])
+            cm_i.team, cm_j.team = cm_j.team, cm_i.team
+        result = [spec_i.name, wins_i], [spec_j.name, wins_j]
+        return result + (played,) if return_events else result
+    finally:
+        # policies with a ponder thread stop it here, so it does not keep running while the worker plays the next pair
+        cm_i.competitor.battle_policy.close()
+        cm_j.competitor.battle_policy.close()
 
-    
-    def start_tournament(self):
+class Tournament():
+
+    def __init__(self, competitors, n_battles: int = 5, record_dir: str = None, lockstep: bool = False,
+                 metrics: str = DEFAULT_METRICS_PATH, metrics_interval: float = 5.):
+        # competitors: list of [ParticipantSpec, team]
+        policies = [i[0].name for i in competitors]
+        count = [0] * len(competitors)
+        self.results = dict(zip(policies, count))
+        print(self.results)
+        self.c = competitors
+        self.n_battles = n_battles
+        self.record_dir = record_dir
+        self.lockstep = lockstep
+        # live metrics file (None to disable), events queue set while a pool is running
+        self.metrics = metrics
+        self.metrics_interval = metrics_interval
+        self.events = None
+
+    def battle_worker(self, pair):
+        i, j = pair
+        return battle_pair(i[0], i[1], j[0], j[1], self.n_battles, self.record_dir, self.lockstep, self.events)
+
+    def _start_events(self, monitor: TelemetryMonitor):
+        # one manager and events queue for the whole tournament, drained by the monitor until _stop_events
+        if monitor is None:
+            return None
+        manager = multiprocessing.Manager()
+        self.events = manager.Queue()
+        monitor.start(self.events)
+        return manager
+
+    def _stop_events(self, manager, monitor: TelemetryMonitor):
+        if monitor is None:
+            return
+        try:
+            monitor.stop()
+        finally:
+            self.events = None
+            manager.shutdown()
+
+    def _monitor(self, total_battles=None):
+        if self.metrics is None:
+            return None
+        return TelemetryMonitor(self.metrics, total_battles, self.metrics_interval)
+
+    def start_tournament(self, address=None, authkey=None, local_workers=0):
+        # address: if given the battles are published on a broker and played by remote workers
         print("Starting tournament...")
         team_combinations = list(combinations(self.c, 2))
-        with multiprocessing.Pool() as pool:
-            partial_results = pool.map(self.battle_worker, team_combinations)
-            print(partial_results)
+        monitor = self._monitor(len(team_combinations) * 2 * self.n_battles)
+        if address is None:
+            manager = self._start_events(monitor)
+            try:
+                with multiprocessing.Pool() as pool:
+                    partial_results = pool.map(self.battle_worker, team_combinations)
+            finally:
+                self._stop_events(manager, monitor)
+        else:
+            # remote workers have no queue to the parent: their events come back with the results
+            tasks = [(i[0], i[1], j[0], j[1], self.n_battles, self.record_dir, self.lockstep, None, True)
+                     for i, j in team_combinations]
+
+            def on_result(task_id, res):
+                if monitor is not None:
+                    for event in res[2]:
+                        monitor.record(event)
+                    monitor.maybe_write()
+
+            partial_results = [res[:2] for res in run_tasks(tasks, address, authkey, local_workers=local_workers,
+                                                            on_result=on_result)]
+            if monitor is not None:
+                monitor.stop()
+        print(partial_results)
         print("Tournament finished.")
 
         for res in partial_results:
@@ -122,5 +232,32 @@ class Tournament():
             self.results[res[1][0]] += res[1][1]
         return self.results
 
+    def start_adaptive_tournament(self, budget=None, min_overlap=0.05):
+        # rounds of pair matches chosen by the scheduler until every pair of competitors is settled
+        # or the budget (number of pair matches) is spent
+        print("Starting adaptive tournament...")
+        by_name = {i[0].name: i for i in self.c}
+        scheduler = AdaptiveScheduler(by_name.keys(), budget=budget, min_overlap=min_overlap)
+        monitor = self._monitor(scheduler.budget * 2 * self.n_battles)
+        manager = self._start_events(monitor)
+        try:
+            with multiprocessing.Pool() as pool:
+                round_size = max(1, len(self.c) // 2)
+                while True:
+                    pairs = scheduler.next_pairs(round_size)
+                    if len(pairs) == 0:
+                        break
+                    partial_results = pool.map(self.battle_worker, [(by_name[i], by_name[j]) for i, j in pairs])
+                    scheduler.report([(res_i[0], res_i[1], res_j[0], res_j[1]) for res_i, res_j in partial_results])
+                    for res_i, res_j in partial_results:
+                        self.results[res_i[0]] += res_i[1]
+                        self.results[res_j[0]] += res_j[1]
+                    print(f"Round finished, {scheduler.played} pair matches: {scheduler.ratings.standings()}")
+        finally:
+            self._stop_events(manager, monitor)
+        print("Tournament finished.")
+        self.ratings = scheduler.ratings
+        return self.ratings
+
 if __name__=='__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,54 @@
+import importlib
+import json
+from typing import Any, Dict, List
+
+class ParticipantSpec():
+    # a participant is declared by the import path of its battle policy ("module:Class")
+    # plus constructor args; the policy module is imported only when build_policy() is called
+
+    def __init__(self, name: str, policy: str, args: List[Any] = None, kwargs: Dict[str, Any] = None):
+        self.name = name
+        self.policy = policy
+        self.args = list(args or [])
+        self.kwargs = dict(kwargs or {})
+
+    def build_policy(self):
+        return load_object(self.policy)(*self.args, **self.kwargs)
+
+    def build_competitor(self):
+        from bots.fCompetitor import fCompetitor
+        return fCompetitor(self.name, battle_policy=self.build_policy())
+
+    def __repr__(self):
+        return f'ParticipantSpec(name: {self.name}, policy: {self.policy}, args: {self.args}, kwargs: {self.kwargs})'
+
+def load_object(path: str):
+    if ':' in path:
+        module_name, attr = path.split(':', 1)
+    else:
+        module_name, attr = path.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), attr)
+
+def parse_participant(d: Dict[str, Any]) -> ParticipantSpec:
+    if 'name' not in d or 'policy' not in d:
+        raise ValueError(f'participant needs a "name" and a "policy" import path: {d}')
+    return ParticipantSpec(d['name'], d['policy'], d.get('args'), d.get('kwargs'))
+
+class TournamentConfig():
+
+    def __init__(self, participants: List[ParticipantSpec], output: str = None, n_battles: int = 5, seed: int = None):
+        names = [p.name for p in participants]
+        if len(set(names)) != len(names):
+            raise ValueError(f'participant names must be unique: {names}')
+        self.participants = participants
+        self.output = output
+        self.n_battles = n_battles
+        self.seed = seed
+
+def load_config(path: str) -> TournamentConfig:
+    with open(path) as f:
+        d = json.load(f)
+    return TournamentConfig([parse_participant(p) for p in d['participants']],
+                            output=d.get('output'),
+                            n_battles=d.get('n_battles', 5),
+                            seed=d.get('seed'))
@@ -0,0 +1,173 @@
+import argparse
+import math
+import multiprocessing
+import random
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from bots.EvalWeights import EVAL_WEIGHTS_PATH, WEIGHT_NAMES, load_weights, save_weights
+from TournamentConfig import ParticipantSpec
+
+# SPSA tuning of the game_state_eval weights: every candidate plays the same seeded battles
+# (same teams, same random stream) against a fixed opponent, so candidates are compared on
+# common random numbers and the difference in wins is mostly signal. The SPSA step and the
+# challenge against the best weights use different seeds, so the step is not judged on the
+# battles it was fitted to
+
+ROSTER_SEED = 12345
+_worker = {}
+
+def _init_worker(policy: str, depth: int, opponent: str, roster_seed: int) -> None:
+    from vgc.util.generator.PkmRosterGenerators import RandomPkmRosterGenerator
+    random.seed(roster_seed)
+    np.random.seed(roster_seed)
+    _worker['roster'] = RandomPkmRosterGenerator().gen_roster()
+    _worker['policy'] = policy
+    _worker['depth'] = depth
+    _worker['opponent'] = ParticipantSpec('Opponent', opponent)
+
+def play_seeded(weights: Dict[str, float], seed: int) -> int:
+    # 1 if the policy with `weights` wins the battle identified by `seed`, 0 otherwise;
+    # odd seeds swap the sides so that both players get both teams
+    from vgc.competition.BattleMatch import BattleMatch
+    from vgc.competition.Competitor import CompetitorManager
+    from vgc.util.generator.PkmTeamGenerators import RandomTeamFromRoster
+    from bots.fCompetitor import fCompetitor
+
+    random.seed(seed)
+    np.random.seed(seed)
+    tg = RandomTeamFromRoster(_worker['roster'])
+    teams = [tg.get_team(), tg.get_team()]
+    spec = ParticipantSpec('Tuned', _worker['policy'], [_worker['depth']], {'weights': weights, 'seed': seed})
+    cms = [CompetitorManager(fCompetitor('Tuned', battle_policy=spec.build_policy())),
+           CompetitorManager(_worker['opponent'].build_competitor())]
+    side = seed % 2
+    if side == 1:
+        cms.reverse()
+    cms[0].team, cms[1].team = teams
+    random.seed(seed)
+    np.random.seed(seed)
+    match = BattleMatch(cms[0], cms[1], debug=False)
+    try:
+        match.run()
+    finally:
+        for cm in cms:
+            cm.competitor.battle_policy.close()
+    return int(match.winner() == side)
+
+def _play(args) -> int:
+    return play_seeded(*args)
+
+def _paired_stats(diffs: List[int]) -> Tuple[float, float]:
+    # mean and standard error of the paired win differences (each in -1, 0, 1)
+    d = np.array(diffs)
+    return float(d.mean()), math.sqrt(max((d != 0).sum(), 1)) / len(d)
+
+def _to_weights(x: np.ndarray, scale: np.ndarray) -> Dict[str, float]:
+    # the search works on weights relative to the starting ones, clipped at 0
+    return {name: float(max(v, 0.) * s) for name, v, s in zip(WEIGHT_NAMES, x, scale)}
+
+class Tuner():
+
+    def __init__(self, pool, start: Dict[str, float], seeds_per_eval: int = 200, a: float = 0.5, c: float = 0.15,
+                 alpha: float = 0.602, gamma: float = 0.101, chunk: int = 50, z: float = 2.5, output: str = EVAL_WEIGHTS_PATH,
+                 challenge_seeds: int = None):
+        # a, c, alpha, gamma: SPSA gain sequences a_k = a/(k+1)^alpha, c_k = c/(k+1)^gamma
+        # chunk, z: a candidate is dropped as soon as it is z standard errors behind the best on the paired seeds,
+        # and accepted only if at the end it is z standard errors ahead
+        # challenge_seeds: held-out battles per challenge (default seeds_per_eval)
+        self.pool = pool
+        self.scale = np.array([abs(start[n]) or 1. for n in WEIGHT_NAMES])
+        self.x = np.array([start[n] for n in WEIGHT_NAMES]) / self.scale
+        self.seeds_per_eval = seeds_per_eval
+        self.challenge_seeds = challenge_seeds or seeds_per_eval
+        self.a, self.c, self.alpha, self.gamma = a, c, alpha, gamma
+        self.chunk = chunk
+        self.z = z
+        self.output = output
+        self.best_x = self.x.copy()
+        self.best_results: Dict[int, int] = {}
+        self.battles = 0
+
+    def _play(self, jobs: List[Tuple[Dict[str, float], int]]) -> List[int]:
+        self.battles += len(jobs)
+        return self.pool.map(_play, jobs, chunksize=max(1, len(jobs) // (4 * multiprocessing.cpu_count())))
+
+    def _best_on(self, seeds: List[int]) -> List[int]:
+        missing = [s for s in seeds if s not in self.best_results]
+        if missing:
+            weights = _to_weights(self.best_x, self.scale)
+            for s, r in zip(missing, self._play([(weights, s) for s in missing])):
+                self.best_results[s] = r
+        return [self.best_results[s] for s in seeds]
+
+    def challenge(self, x: np.ndarray, seeds: List[int]) -> Tuple[bool, float]:
+        # sequential paired comparison with the best weights; returns (accepted, win rate difference)
+        weights = _to_weights(x, self.scale)
+        diffs = []
+        for start in range(0, len(seeds), self.chunk):
+            chunk = seeds[start:start + self.chunk]
+            diffs += [c - b for c, b in zip(self._play([(weights, s) for s in chunk]), self._best_on(chunk))]
+            mean, se = _paired_stats(diffs)
+            if mean < -self.z * se:
+                return False, mean
+        mean, se = _paired_stats(diffs)
+        return mean > self.z * se, mean
+
+    def step(self, k: int, seeds: List[int]) -> None:
+        ck = self.c / (k + 1) ** self.gamma
+        ak = self.a / (k + 1) ** self.alpha
+        delta = np.random.choice([-1., 1.], size=len(self.x))
+        plus, minus = _to_weights(self.x + ck * delta, self.scale), _to_weights(self.x - ck * delta, self.scale)
+        results = self._play([(plus, s) for s in seeds] + [(minus, s) for s in seeds])
+        f_plus, f_minus = np.mean(results[:len(seeds)]), np.mean(results[len(seeds):])
+        self.x = np.maximum(self.x + ak * (f_plus - f_minus) / (2 * ck * delta), 0.)
+
+    def run(self, iterations: int, time_budget: float = None, seed: int = 0) -> Dict[str, float]:
+        rng = random.Random(seed)
+        start = time.monotonic()
+        for k in range(iterations):
+            if time_budget is not None and time.monotonic() - start > time_budget:
+                print('Time budget exhausted')
+                break
+            # new seeds every iteration: the same ones for the two perturbations, fresh ones (shared by the
+            # candidate and the best weights) for the challenge
+            seeds = [rng.randrange(2**31) for _ in range(self.seeds_per_eval)]
+            held_out = [rng.randrange(2**31) for _ in range(self.challenge_seeds)]
+            self.step(k, seeds)
+            accepted, diff = self.challenge(self.x, held_out)
+            print(f'[{k}] {_to_weights(self.x, self.scale)} vs best: {diff:+.3f} {"accepted" if accepted else "rejected"}'
+                  f' ({self.battles} battles, {time.monotonic() - start:.0f}s)')
+            if accepted:
+                self.best_x = self.x.copy()
+                self.best_results = {}
+                save_weights(_to_weights(self.best_x, self.scale), self.output)
+        return _to_weights(self.best_x, self.scale)
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Tune the game_state_eval weights with SPSA over seeded battles.')
+    parser.add_argument('--policy', default='bots.MixedPolicy:MixedPolicy', help='policy using the weights (import path)')
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--opponent', default='bots.GreedyPolicy:GreedyPolicy', help='fixed opponent (import path)')
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--seeds', type=int, default=200, help='battles per candidate evaluation')
+    parser.add_argument('--challenge-seeds', type=int, help='held-out battles per challenge (default --seeds)')
+    parser.add_argument('--z', type=float, default=2.5, help='standard errors a candidate must be ahead to be accepted')
+    parser.add_argument('--hours', type=float, help='stop after this many hours')
+    parser.add_argument('-o', '--output', default=EVAL_WEIGHTS_PATH, help='where the best weights are written')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-j', '--processes', type=int)
+    args = parser.parse_args(argv)
+
+    np.random.seed(args.seed)
+    with multiprocessing.Pool(args.processes, initializer=_init_worker,
+                              initargs=(args.policy, args.depth, args.opponent, ROSTER_SEED)) as pool:
+        tuner = Tuner(pool, load_weights(args.output), seeds_per_eval=args.seeds, z=args.z, output=args.output,
+                      challenge_seeds=args.challenge_seeds)
+        best = tuner.run(args.iterations, args.hours * 3600 if args.hours else None, args.seed)
+    print(f'Best weights: {best}')
+
+if __name__=='__main__':
+    main()
@@ -1,5 +1,6 @@
-from typing import Any, List, Union
-from copy import deepcopy
+from typing import Any, Dict, List, Union
+from copy import copy, deepcopy
+from functools import partial
 
 import math
 import numpy as np
@@ -11,6 +12,12 @@ from vgc.datatypes.Objects import GameState, PkmTeam, PkmType, Pkm
 from vgc.datatypes.Constants import DEFAULT_N_ACTIONS, TYPE_CHART_MULTIPLIER
 from vgc.competition.StandardPkmMoves import STANDARD_MOVE_ROSTER
 
+from bots.DecisionCache import DecisionCache, source_version
+from bots.EvalWeights import EVAL_WEIGHTS
+from bots.Endgame import EndgameSolver, is_endgame
+from bots.Ponder import Ponderer
+from bots.SelectiveSearch import SelectiveConfig, make_config, new_stats, selective_max_value
+
 class Node():
 
   def __init__(self):
@@ -19,6 +26,9 @@ class Node():
     self.parent: Node = None
     self.depth: int = 0
     self.value: float = 0.
+    # ricerca selettiva: spostamento dell'orizzonte (> 0 ridotto, < 0 esteso) ed estensioni usate sul cammino
+    self.offset: int = 0
+    self.extensions: int = 0
 
   def __str__(self):
     return f'Node(action: {self.action}, depth: {self.depth}, value: {self.value}, parent: {str(self.parent)})'
@@ -47,7 +57,8 @@ def match_up_eval(my_pkm_type: PkmType,
     
   return offensive_match_up - defensive_match_up
 
-def estimate_move(pkm: Pkm) -> None:
+def estimate_move(pkm: Pkm, rng: random.Random = random) -> None:
+  # rng: generatore da usare (il ponder passa il suo, per non spostare la sequenza del modulo random)
   # controlla se è già presente una mossa del tipo del pokemon
   type_m = sum([move.type==pkm.type for move in pkm.moves if move.name is not None])
   for move_i in range(DEFAULT_N_ACTIONS-2):
@@ -56,13 +67,13 @@ def estimate_move(pkm: Pkm) -> None:
       # prendo in considerazione solo mosse di attacco, che sono quelle che mi preoccupano di più
       if type_m==0:
         type_moves = [move for move in STANDARD_MOVE_ROSTER if move.type==pkm.type and move.power>0.0]
-        pkm.moves[move_i] = random.choice(type_moves)
+        pkm.moves[move_i] = rng.choice(type_moves)
         type_m = 1
       else:
         # faccio in modo che sia diversa dalle mosse che ho già
-        move = random.choice(STANDARD_MOVE_ROSTER)
+        move = rng.choice(STANDARD_MOVE_ROSTER)
         while(move in pkm.moves):
-          move = random.choice(STANDARD_MOVE_ROSTER)
+          move = rng.choice(STANDARD_MOVE_ROSTER)
         pkm.moves[move_i] = move
 
 def status_eval(pkm: Pkm) -> float:
@@ -79,7 +90,7 @@ def stage_eval(team: PkmTeam) -> int:
     stage += s
   return stage
 
-def game_state_eval(g: GameState, depth: int):
+def game_state_eval(g: GameState, depth: int, weights: Dict[str, float] = EVAL_WEIGHTS):
   my_team = g.teams[0]
   opp_team  = g.teams[1]
   my_active: Pkm = my_team.active
@@ -93,14 +104,14 @@ def game_state_eval(g: GameState, depth: int):
   my_status = status_eval(my_active)
   opp_status = status_eval(opp_active)
   return (match_up 
-          + my_active.hp/my_active.max_hp*3
-          - opp_active.hp/opp_active.max_hp*3
-          + 0.2*my_stage
-          - 0.2*opp_stage
+          + my_active.hp/my_active.max_hp*weights['hp']
+          - opp_active.hp/opp_active.max_hp*weights['hp']
+          + weights['stage']*my_stage
+          - weights['stage']*opp_stage
           + my_status
           - opp_status
-          - 0.3*math.ceil(depth/2)
-          + (my_team.party[0].hp/my_team.party[0].max_hp+my_team.party[1].hp/my_team.party[1].max_hp)*2)
+          - weights['depth']*math.ceil(depth/2)
+          + (my_team.party[0].hp/my_team.party[0].max_hp+my_team.party[1].hp/my_team.party[1].max_hp)*weights['party_hp'])
 # ma noi possiamo vedere la vita del party avversario?????
 
 def n_fainted(team: PkmTeam) -> int:
@@ -112,13 +123,72 @@ def n_fainted(team: PkmTeam) -> int:
     fainted += team.party[1].hp == 0
   return fainted
 
+def estimate_opp_moves(g: GameState, rng: random.Random = random) -> None:
+  estimate_move(g.teams[1].active, rng)
+
 class AlphaBetaPolicy(BattlePolicy):
 
-  def __init__(self, max_depth: int = 6, seed: int = 69):
+  def __init__(self, max_depth: int = 6, seed: int = 69, cache_path: str = None, endgame: bool = True,
+               weights: Dict[str, float] = None, ponder: bool = False, ponder_duty: float = 0.5,
+               selective: Union[bool, dict, SelectiveConfig] = False):
     self.max_depth = max_depth
+    # pesi di game_state_eval, di default quelli di bots/eval_weights.json
+    self.weights = dict(weights) if weights is not None else dict(EVAL_WEIGHTS)
+    # cache su disco delle decisioni (None per disattivarla), invalidata se cambia la valutazione
+    self.cache = None
+    if cache_path is not None:
+      self.cache = DecisionCache(cache_path, source_version(game_state_eval, match_up_eval, status_eval, stage_eval,
+                                                          sorted(self.weights.items())))
+    self.last_value: float = None
+    # ricerca selettiva (bots/SelectiveSearch.py): True, un dict di opzioni o una SelectiveConfig
+    self.selective = make_config(selective)
+    self.selective_stats = new_stats()
+    # nei finali (1v1, 1v2) si passa al risolutore esatto al posto della ricerca a profondità fissa
+    self.endgame = EndgameSolver(partial(game_state_eval, weights=self.weights), estimate_opp_moves) if endgame else None
+    # nodi visitati dalla ricerca (li azzera chi misura, es. Benchmark.py)
+    self.nodes = 0
+    # nodi e contatori della ricerca selettiva del thread di ponder, tenuti a parte
+    self.ponder_nodes = 0
+    self.ponder_selective_stats = new_stats()
+    # ricerca in background degli stati successivi mentre l'avversario decide (usa al massimo ponder_duty di una cpu)
+    self.ponderer = Ponderer(self._ponder_search, estimate_opp_moves, partial(game_state_eval, weights=self.weights),
+                             ponder_duty, seed=seed) if ponder else None
     random.seed(seed)
 
   def get_action(self, g: GameState) -> int:
+    if self.ponderer is None:
+      return self._get_action(g)
+    # il thread va fermato prima di cercare; se aveva già cercato questo stato uso la sua decisione
+    action = self.ponderer.lookup(g)
+    if action is None or (self.endgame is not None and is_endgame(g)):
+      action = self._get_action(g)
+    self.ponderer.start(g, action)
+    return action
+
+  def close(self):
+    if self.ponderer is not None:
+      self.ponderer.stop()
+
+  def _ponder_search(self, g: GameState) -> Union[int, None]:
+    # la stessa ricerca di _get_action, senza risolutore dei finali né cache
+    if self.endgame is not None and is_endgame(g):
+      return None
+    root: Node = Node()
+    root.gameState = deepcopy(g)
+    estimate_move(root.gameState.teams[1].active, self.ponderer.rng)
+    # cerca una copia della policy con contatori propri, che poi vanno in ponder_nodes / ponder_selective_stats
+    searcher = copy(self)
+    searcher.nodes = 0
+    searcher.selective_stats = new_stats()
+    try:
+      _, action = searcher._max_value(root, -np.inf, np.inf)
+    finally:
+      self.ponder_nodes += searcher.nodes
+      for k, v in searcher.selective_stats.items():
+        self.ponder_selective_stats[k] += v
+    return action
+
+  def _get_action(self, g: GameState) -> int:
     root: Node = Node()
     root.gameState = g
 
@@ -130,9 +200,23 @@ class AlphaBetaPolicy(BattlePolicy):
     # print(g.teams[1])
     # print('---------------------------------')
     
+    if self.endgame is not None and is_endgame(g):
+      action = self.endgame.solve(g)
+      if action is not None:
+        return action
+
+    # la chiave va calcolata prima di estimate_move, che modifica lo stato
+    if self.cache is not None:
+      key = self.cache.key(g, f'AlphaBeta:{self.max_depth}' + (f':{self.selective}' if self.selective else ''))
+      hit = self.cache.get(key)
+      if hit is not None:
+        return hit[0]
+
     # stimo delle mosse dell'avversario che non conosco
     estimate_move(root.gameState.teams[1].active)
     action = self._alphaBeta_search(root)
+    if self.cache is not None:
+      self.cache.put(key, action, self.last_value)
     return action
 
   def _alphaBeta_search(
@@ -143,6 +227,7 @@ class AlphaBetaPolicy(BattlePolicy):
   ) -> int:
     #print("ALPHA BETA SEARCH")
     value, move = self._max_value(root, alpha, beta)
+    self.last_value = value
     #print('---------------------------------')
     #print(f'AlphaBetaPolicy chose action: {root.gameState.teams[0].active.moves[move]}, with value: {value}')
     #print('---------------------------------')
@@ -154,14 +239,19 @@ class AlphaBetaPolicy(BattlePolicy):
       alpha: float,
       beta: float
   ) -> tuple[float, Union[int, None]]:
+    self.nodes += 1
+    if self.ponderer is not None:
+      self.ponderer.checkpoint()
     state: GameState = deepcopy(node.gameState)
+    if self.selective is not None:
+      return selective_max_value(self, node, state, alpha, beta, partial(game_state_eval, weights=self.weights))
     # print('---------------------------------')
     # print(f'CURRENT NODE: {str(node)}')
     # print('---------------------------------')
     # print(f'MY HP: {state.teams[1].active.hp}')
     # print(f'OPPONENT HP: {state.teams[1].active.hp}')
     if state.teams[1].active.hp == 0 or state.teams[0].active.hp == 0 or node.depth >= self.max_depth:
-      return game_state_eval(state, node.depth), None
+      return game_state_eval(state, node.depth, self.weights), None
     value = -np.inf
     for i in range(DEFAULT_N_ACTIONS):
       next_node: Node = Node()
@@ -186,15 +276,19 @@ class AlphaBetaPolicy(BattlePolicy):
       alpha: float,
       beta: float
   ) -> tuple[float, Union[int, None]]:
+    self.nodes += 1
     state: GameState = deepcopy(node.gameState)
     value = np.inf
     for i in range(DEFAULT_N_ACTIONS):
-      next_state, _, _, _, _ = state.step([node.action, i])
+      # con il ponder lo step passa dal ponderer, che nel suo thread tiene a parte i lanci del motore
+      next_state, _, _, _, _ = state.step([node.action, i]) if self.ponderer is None else self.ponderer.step(state, [node.action, i])
       next_node: Node = Node()
       next_node.parent = node
       next_node.depth = node.depth + 1
       next_node.action = i
       next_node.gameState = next_state[0]
+      next_node.offset = node.offset
+      next_node.extensions = node.extensions
       next_node.value, _ = self._max_value(next_node, alpha, beta)
       if next_node.value < value:
         value, move = next_node.value, next_node.action
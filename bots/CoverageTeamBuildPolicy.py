@@ -0,0 +1,139 @@
+import time
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from vgc.behaviour import TeamBuildPolicy
+from vgc.datatypes.Objects import PkmFullTeam, PkmTemplate
+from vgc.datatypes.Constants import DEFAULT_PKM_N_MOVES
+
+from bots.RosterIndex import RosterIndex
+
+TEAM_SIZE = 6
+
+class CoverageTeamBuildPolicy(TeamBuildPolicy):
+  # costruisce la squadra dal roster indicizzato (RosterIndex):
+  #   1. per ogni pkm sceglie le mosse che coprono meglio i tipi del roster (greedy, tutti i pkm insieme)
+  #   2. match up di ogni pkm contro ogni tipo: corsa al ko tra le sue mosse e le mosse stab medie di quel tipo
+  #   3. beam search sulle squadre, poi ricerca locale a scambi (con ripartenze) finché c'è tempo
+  # il punteggio di una squadra è, pesato con la frequenza dei tipi, il miglior match up che ha contro
+  # ogni tipo più il match up medio dei suoi membri; ogni passo valuta tutti i candidati con un'operazione numpy
+
+  def __init__(self, time_budget: float = 0.5, beam_width: int = 16, pool_size: int = 512, mean_weight: float = 0.5,
+               seed: int = 69):
+    self.time_budget = time_budget
+    self.beam_width = beam_width
+    self.pool_size = pool_size
+    self.mean_weight = mean_weight
+    self.rng = np.random.default_rng(seed)
+    self.index: RosterIndex = None
+    self.weights: np.ndarray = None
+    self.moves: np.ndarray = None
+    self.match_up: np.ndarray = None
+    self.pool: np.ndarray = None
+
+  def set_roster(self, roster: Iterable[PkmTemplate], ver: int = 0):
+    index = RosterIndex(roster)
+    # solo i pkm con almeno una mossa possono entrare in squadra
+    candidates = np.flatnonzero(index.move_mask.any(axis=1))
+    if len(candidates) < TEAM_SIZE:
+      raise ValueError(f'the roster has {len(candidates)} pkm with moves, a team needs {TEAM_SIZE}')
+    self.index = index
+    self.weights = self.index.type_frequency()
+    self.moves, cover = self._choose_moves()
+    self.match_up = self._match_up(cover)
+    # i candidati sono i pkm con il miglior match up medio
+    individual = self.match_up[candidates] @ self.weights
+    self.pool = candidates[np.argsort(-individual, kind='stable')[:max(self.pool_size, TEAM_SIZE)]]
+
+  def _choose_moves(self) -> Tuple[np.ndarray, np.ndarray]:
+    dmg = self.index.move_damage
+    N, _, T = dmg.shape
+    rows = np.arange(N)
+    chosen = np.zeros((N, DEFAULT_PKM_N_MOVES), dtype=np.int64)
+    cover = np.zeros((N, T))
+    available = self.index.move_mask.copy()
+    for s in range(DEFAULT_PKM_N_MOVES):
+      # gen_pkm vuole DEFAULT_PKM_N_MOVES indici: un pkm con meno mosse ripete la sua prima mossa
+      gain = (np.maximum(cover[:, None, :], dmg) * self.weights).sum(axis=-1)
+      best = np.where(available.any(axis=1), np.where(available, gain, -np.inf).argmax(axis=1), chosen[:, 0])
+      chosen[:, s] = best
+      available[rows, best] = False
+      cover = np.maximum(cover, dmg[rows, best])
+    return chosen, cover
+
+  def _match_up(self, cover: np.ndarray) -> np.ndarray:
+    # in [-1, 1]: > 0 se il pkm toglie hp a un avversario di quel tipo più in fretta di quanto ne perde
+    my_rate = cover / self.index.mean_hp()
+    opp_rate = self.index.mean_stab_damage()[:, self.index.types].T / np.maximum(self.index.max_hp, 1.)[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+      return np.nan_to_num((my_rate - opp_rate) / (my_rate + opp_rate))
+
+  def _score(self, best: np.ndarray, total: np.ndarray, size: int) -> np.ndarray:
+    return (best + self.mean_weight * total / size) @ self.weights
+
+  def _beam_search(self, P: np.ndarray) -> np.ndarray:
+    C, T = P.shape
+    beams = np.zeros((1, 0), dtype=np.int64)
+    best = np.full((1, T), -np.inf)
+    total = np.zeros((1, T))
+    for size in range(1, TEAM_SIZE + 1):
+      new_best = np.maximum(best[:, None, :], P[None])
+      new_total = total[:, None, :] + P[None]
+      scores = self._score(new_best, new_total, size)
+      member = np.zeros((len(beams), C), dtype=bool)
+      np.put_along_axis(member, beams, True, axis=1)
+      scores[member] = -np.inf
+      kept, seen = [], set()
+      for flat in np.argsort(-scores, axis=None, kind='stable'):
+        b, c = divmod(int(flat), C)
+        if not np.isfinite(scores[b, c]):
+          break
+        team = frozenset(beams[b].tolist() + [c])
+        if team not in seen:
+          seen.add(team)
+          kept.append((b, c))
+          if len(kept) == self.beam_width:
+            break
+      b, c = np.array(kept).T
+      beams = np.concatenate([beams[b], c[:, None]], axis=1)
+      best, total = new_best[b, c], new_total[b, c]
+    return beams[0]
+
+  def _local_search(self, P: np.ndarray, team: np.ndarray, deadline: float) -> Tuple[np.ndarray, float]:
+    # scambio di un membro alla volta con il miglior candidato, tutti gli scambi valutati insieme
+    others = ~np.eye(TEAM_SIZE, dtype=bool)[:, :, None]
+    while time.monotonic() < deadline:
+      members = P[team]
+      best_others = np.where(others, members[None], -np.inf).max(axis=1)
+      total_others = np.where(others, members[None], 0.).sum(axis=1)
+      scores = self._score(np.maximum(best_others[:, None, :], P[None]), total_others[:, None, :] + P[None], TEAM_SIZE)
+      scores[:, team] = -np.inf
+      current = float(self._score(members.max(axis=0), members.sum(axis=0), TEAM_SIZE))
+      p, c = np.unravel_index(int(np.argmax(scores)), scores.shape)
+      if scores[p, c] <= current + 1e-12:
+        return team, current
+      team = team.copy()
+      team[p] = c
+    members = P[team]
+    return team, float(self._score(members.max(axis=0), members.sum(axis=0), TEAM_SIZE))
+
+  def search(self) -> List[int]:
+    # indici nel roster dei pkm della squadra
+    deadline = time.monotonic() + self.time_budget
+    P = self.match_up[self.pool]
+    best_team, best_score = self._local_search(P, self._beam_search(P), deadline)
+    # ripartenze: perturbo due membri della squadra migliore
+    while time.monotonic() < deadline and len(P) >= TEAM_SIZE + 2:
+      team = best_team.copy()
+      free = np.setdiff1d(np.arange(len(P)), team)
+      team[self.rng.choice(TEAM_SIZE, 2, replace=False)] = self.rng.choice(free, 2, replace=False)
+      team, score = self._local_search(P, team, deadline)
+      if score > best_score:
+        best_team, best_score = team, score
+    return [int(i) for i in self.pool[best_team]]
+
+  def get_action(self, meta) -> PkmFullTeam:
+    if self.index is None:
+      raise ValueError('set_roster must be called before get_action')
+    return PkmFullTeam([self.index.templates[i].gen_pkm([int(m) for m in self.moves[i]]) for i in self.search()])
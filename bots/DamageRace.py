@@ -0,0 +1,141 @@
+from typing import List
+
+import numpy as np
+
+from vgc.datatypes.Types import PkmType, PkmStat, WeatherCondition
+from vgc.datatypes.Objects import GameState, Pkm
+from vgc.datatypes.Constants import DEFAULT_N_ACTIONS, TYPE_CHART_MULTIPLIER
+
+# simulatore vettoriale della "corsa al ko": per ogni opzione mia (4 mosse + 2 cambi) e ogni mossa
+# nota dell'avversario calcola in quanti turni (attesi, tenendo conto dell'accuratezza) ognuno manda
+# ko l'altro e chi vince la corsa considerando priorità e velocità. Niente GameState.step:
+# tutte le combinazioni, anche di un batch di stati, sono calcolate con operazioni su array
+
+N_MOVES = DEFAULT_N_ACTIONS - 2
+N_OPTIONS = DEFAULT_N_ACTIONS
+TYPE_CHART = np.array(TYPE_CHART_MULTIPLIER, dtype=np.float64)
+
+# campi per mossa: tipo, potenza, danno fisso, accuratezza, priorità, utilizzabile (pp > 0 e nome noto)
+M_TYPE, M_POWER, M_FIXED, M_ACC, M_PRIORITY, M_VALID = range(6)
+# campi per pkm: tipo, hp, in vita
+_PKM_TYPE, _HP, _ALIVE = range(3)
+
+def damage(move_type, power, fixed, valid, attacker_type, defender_type, atk_stage, def_stage, weather):
+  # versione vettoriale di calculate_damage (GreedyPolicy/MixedPolicy): gli argomenti sono array broadcastabili
+  move_type = move_type.astype(np.int64)
+  type_rate = TYPE_CHART[move_type, defender_type.astype(np.int64)]
+  stab = np.where(move_type == attacker_type, 1.5, 1.)
+  boost = ((move_type == PkmType.WATER) & (weather == WeatherCondition.RAIN)) | \
+          ((move_type == PkmType.FIRE) & (weather == WeatherCondition.SUNNY))
+  nerf = ((move_type == PkmType.WATER) & (weather == WeatherCondition.SUNNY)) | \
+         ((move_type == PkmType.FIRE) & (weather == WeatherCondition.RAIN))
+  weather_rate = np.where(boost, 1.5, np.where(nerf, .5, 1.))
+  stage_level = atk_stage - def_stage
+  stage = np.where(stage_level >= 0, (stage_level + 2.) / 2, 2. / (np.abs(stage_level) + 2.))
+  dmg = np.where(fixed > 0, fixed, type_rate * stab * weather_rate * stage * power)
+  return np.where(valid & (type_rate > 0), dmg, 0.)
+
+def moves_array(pkm: Pkm) -> List[List[float]]:
+  rows = []
+  for m in pkm.moves[:N_MOVES]:
+    valid = m.pp > 0 and m.name is not None
+    rows.append([int(m.type), m.power, m.fixed_damage, m.acc, float(bool(m.priority)), float(valid)])
+  rows += [[0, 0., 0., 0., 0., 0.]] * (N_MOVES - len(rows))
+  return rows
+
+class DamageRace():
+  # risultato per un batch di B stati; race[i] restituisce quello del singolo stato i
+  #   my_ttk[B, 6, 4]:  turni attesi perché la mia opzione mandi ko l'attivo avversario (inf se non ci riesce)
+  #   opp_ttk[B, 6, 4]: turni attesi perché la mossa avversaria mandi ko il mio pkm in campo con quell'opzione
+  #   first[B, 6, 4]:   1 se attacco prima, 0 se attacca prima lui, 0.5 se dipende dal caso
+  #   win[B, 6, 4]:     probabilità (0, 0.5, 1) di vincere la corsa
+  #   valid[B, 6] / opp_valid[B, 4]: opzioni mie praticabili / mosse avversarie note
+
+  def __init__(self, my_ttk, opp_ttk, first, win, valid, opp_valid, my_damage):
+    self.my_ttk = my_ttk
+    self.opp_ttk = opp_ttk
+    self.first = first
+    self.win = win
+    self.valid = valid
+    self.opp_valid = opp_valid
+    self.my_damage = my_damage
+
+  def __getitem__(self, i: int) -> 'DamageRace':
+    return DamageRace(self.my_ttk[i], self.opp_ttk[i], self.first[i], self.win[i], self.valid[i], self.opp_valid[i],
+                      self.my_damage[i])
+
+  def turns_to_ko(self) -> np.ndarray:
+    # turni attesi per mandare ko l'attivo avversario con ogni mia opzione (non dipende dalla sua mossa)
+    return self.my_ttk[..., 0]
+
+  def worst_case_win(self) -> np.ndarray:
+    # per ogni mia opzione, l'esito della corsa contro la risposta migliore (nota) dell'avversario
+    win = np.where(self.opp_valid[..., None, :], self.win, np.inf)
+    worst = win.min(axis=-1)
+    return np.where(np.isinf(worst), 1., worst) * self.valid
+
+def damage_race(states: List[GameState]) -> DamageRace:
+  B = len(states)
+  # estrazione in array (unico ciclo python, costante per stato)
+  my_moves = np.zeros((B, 3, N_MOVES, 6))      # attivo + 2 pkm in panchina
+  my_pkm = np.zeros((B, 3, 3))
+  opp_moves = np.zeros((B, N_MOVES, 6))
+  opp_pkm = np.zeros((B, 3))
+  stages = np.zeros((B, 2, 2))                  # [mio/suo, attacco/difesa]
+  speed = np.zeros((B, 2))
+  weather = np.zeros(B)
+  for b, g in enumerate(states):
+    my_team, opp_team = g.teams[0], g.teams[1]
+    team = [my_team.active] + list(my_team.party)
+    for p, pkm in enumerate(team[:3]):
+      my_moves[b, p] = moves_array(pkm)
+      my_pkm[b, p] = [int(pkm.type), pkm.hp, float(pkm.hp > 0)]
+    opp_moves[b] = moves_array(opp_team.active)
+    opp_pkm[b] = [int(opp_team.active.type), opp_team.active.hp, float(opp_team.active.hp > 0)]
+    stages[b] = [[my_team.stage[PkmStat.ATTACK], my_team.stage[PkmStat.DEFENSE]],
+                 [opp_team.stage[PkmStat.ATTACK], opp_team.stage[PkmStat.DEFENSE]]]
+    speed[b] = [my_team.stage[PkmStat.SPEED], opp_team.stage[PkmStat.SPEED]]
+    weather[b] = int(g.weather.condition)
+  return _race(my_moves, my_pkm, opp_moves, opp_pkm, stages, speed, weather)
+
+def _race(my_moves, my_pkm, opp_moves, opp_pkm, stages, speed, weather) -> DamageRace:
+  w = weather[:, None, None]
+  # danno atteso di ogni mossa di ognuno dei miei pkm contro l'attivo avversario: [B, 3, 4]
+  my_dmg = damage(my_moves[..., M_TYPE], my_moves[..., M_POWER], my_moves[..., M_FIXED], my_moves[..., M_VALID] > 0,
+                  my_pkm[:, :, None, _PKM_TYPE], opp_pkm[:, None, None, _PKM_TYPE],
+                  stages[:, None, None, 0, 0], stages[:, None, None, 1, 1], w)
+  my_exp = my_dmg * my_moves[..., M_ACC]
+  # danno atteso di ogni mossa avversaria contro ognuno dei miei pkm: [B, 3, 4]
+  opp_dmg = damage(opp_moves[:, None, :, M_TYPE], opp_moves[:, None, :, M_POWER], opp_moves[:, None, :, M_FIXED],
+                   opp_moves[:, None, :, M_VALID] > 0, opp_pkm[:, None, None, _PKM_TYPE], my_pkm[:, :, None, _PKM_TYPE],
+                   stages[:, None, None, 1, 0], stages[:, None, None, 0, 1], w)
+  opp_acc = opp_moves[:, None, :, M_ACC]
+
+  # opzioni: 0-3 mosse dell'attivo, 4-5 cambio col pkm di panchina (che poi usa la sua mossa migliore)
+  best = my_exp[:, 1:].argmax(axis=-1)                                    # [B, 2]
+  opt_dmg = np.concatenate([my_dmg[:, 0], np.take_along_axis(my_dmg[:, 1:], best[..., None], -1)[..., 0]], axis=1)
+  opt_acc = np.concatenate([my_moves[:, 0, :, M_ACC], np.take_along_axis(my_moves[:, 1:, :, M_ACC], best[..., None], -1)[..., 0]], axis=1)
+  opt_priority = np.concatenate([my_moves[:, 0, :, M_PRIORITY],
+                                 np.take_along_axis(my_moves[:, 1:, :, M_PRIORITY], best[..., None], -1)[..., 0]], axis=1)
+  fighter = np.array([0] * N_MOVES + [1, 2])                               # pkm in campo per ogni opzione
+  valid = np.concatenate([np.broadcast_to(my_pkm[:, :1, _ALIVE], (len(my_pkm), N_MOVES)) * (my_moves[:, 0, :, M_VALID] > 0),
+                          my_pkm[:, 1:, _ALIVE]], axis=1) > 0
+
+  with np.errstate(divide='ignore', invalid='ignore'):
+    hits = np.ceil(opp_pkm[:, None, _HP] / opt_dmg)
+    my_ttk = np.where(opt_dmg * opt_acc > 0, hits / np.maximum(opt_acc, 1e-9), np.inf)    # [B, 6]
+    opp_hits = np.ceil(my_pkm[:, fighter, _HP][..., None] / opp_dmg[:, fighter])           # [B, 6, 4]
+    opp_ttk = np.where(opp_dmg[:, fighter] * opp_acc > 0, opp_hits / np.maximum(opp_acc, 1e-9), np.inf)
+  # col cambio perdo un turno: il pkm che entra incassa un colpo prima di poter attaccare
+  switch = (fighter >= 1)[None, :]
+  my_ttk = my_ttk + switch
+  my_ttk = np.broadcast_to(my_ttk[..., None], opp_ttk.shape)
+
+  opp_priority = opp_moves[:, None, :, M_PRIORITY]
+  speed_diff = (speed[:, 0] - speed[:, 1])[:, None, None]
+  faster = np.where(speed_diff > 0, 1., np.where(speed_diff < 0, 0., .5))
+  first = np.where(opt_priority[..., None] > opp_priority, 1., np.where(opt_priority[..., None] < opp_priority, 0., faster))
+  win = np.where(my_ttk < opp_ttk, 1., np.where(my_ttk > opp_ttk, 0., first))
+  win = np.where(np.isinf(my_ttk) & np.isinf(opp_ttk), .5, win) * valid[..., None]
+  return DamageRace(np.where(valid[..., None], my_ttk, np.inf), opp_ttk, first, win, valid,
+                    opp_moves[..., M_VALID] > 0, opt_dmg)
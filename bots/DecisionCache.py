@@ -0,0 +1,95 @@
+import hashlib
+import inspect
+import os
+import sqlite3
+from typing import Optional, Tuple
+
+from vgc.datatypes.Objects import GameState
+
+from bots.StateCodec import state_bytes
+
+# cache persistente delle decisioni delle policy di ricerca: stato canonico + configurazione
+# della policy -> (azione, valore). È un file sqlite in WAL condiviso fra i worker del pool:
+# le letture non bloccano, le scritture sono poche (solo i miss)
+
+def source_version(*objs) -> str:
+  # versione della funzione di valutazione: se cambia il codice (o i pesi) la cache va invalidata
+  h = hashlib.sha1()
+  for obj in objs:
+    try:
+      h.update(inspect.getsource(obj).encode())
+    except (OSError, TypeError):
+      h.update(repr(obj).encode())
+  return h.hexdigest()[:16]
+
+class DecisionCache():
+
+  def __init__(self, path: str, eval_version: str, max_entries: int = 200000, timeout: float = 30.):
+    self.path = path
+    self.eval_version = eval_version
+    self.max_entries = max_entries
+    self.timeout = timeout
+    self.hits = 0
+    self.misses = 0
+    self._puts = 0
+    self._conn = None
+    self._pid = None
+
+  def __getstate__(self):
+    # la connessione non si può passare ad un altro processo, viene riaperta al primo uso
+    state = self.__dict__.copy()
+    state['_conn'] = None
+    state['_pid'] = None
+    return state
+
+  @property
+  def conn(self) -> sqlite3.Connection:
+    if self._conn is None or self._pid != os.getpid():
+      self._conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+      self._pid = os.getpid()
+      self._conn.execute('PRAGMA journal_mode=WAL')
+      self._conn.execute('PRAGMA synchronous=NORMAL')
+      self._conn.execute('CREATE TABLE IF NOT EXISTS decisions (key BLOB PRIMARY KEY, action INTEGER NOT NULL, value REAL)')
+      self._conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+      self._check_version()
+    return self._conn
+
+  def _check_version(self) -> None:
+    row = self._conn.execute("SELECT value FROM meta WHERE name='eval_version'").fetchone()
+    if row is not None and row[0] == self.eval_version:
+      return
+    self._conn.execute('BEGIN IMMEDIATE')
+    # ricontrollo col lock preso, un altro worker potrebbe averla già invalidata
+    row = self._conn.execute("SELECT value FROM meta WHERE name='eval_version'").fetchone()
+    if row is None or row[0] != self.eval_version:
+      self._conn.execute('DELETE FROM decisions')
+      self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('eval_version', ?)", (self.eval_version,))
+    self._conn.execute('COMMIT')
+
+  def key(self, g: GameState, config: str) -> bytes:
+    return hashlib.blake2b(state_bytes(g) + config.encode(), digest_size=16).digest()
+
+  def get(self, key: bytes) -> Optional[Tuple[int, float]]:
+    row = self.conn.execute('SELECT action, value FROM decisions WHERE key=?', (key,)).fetchone()
+    if row is None:
+      self.misses += 1
+    else:
+      self.hits += 1
+    return row
+
+  def put(self, key: bytes, action: int, value: float) -> None:
+    try:
+      self.conn.execute('INSERT OR REPLACE INTO decisions VALUES (?, ?, ?)', (key, int(action), float(value)))
+    except sqlite3.OperationalError:
+      # database occupato oltre il timeout: la decisione semplicemente non viene salvata
+      return
+    self._puts += 1
+    if self._puts % min(1000, max(1, self.max_entries // 10)) == 0:
+      self._evict()
+
+  def _evict(self) -> None:
+    # le righe più vecchie (rowid più basso) escono per prime
+    n = self.conn.execute('SELECT COUNT(*) FROM decisions').fetchone()[0]
+    if n > self.max_entries:
+      self.conn.execute('DELETE FROM decisions WHERE rowid IN (SELECT rowid FROM decisions ORDER BY rowid LIMIT ?)',
+                        (n - self.max_entries,))
@@ -0,0 +1,149 @@
+from typing import List
+
+import numpy as np
+
+from vgc.datatypes.Types import PkmStat
+from vgc.datatypes.Objects import GameState, Pkm, PkmTeam
+
+from bots.AlphaBetaPolicy import match_up_eval, status_eval, stage_eval
+from bots.GreedyPolicy import calculate_damage, n_fainted
+
+# valutatore "distillato": un modello numpy piccolo (lineare o mlp a un livello) addestrato con Distill.py
+# a predire il valore della ricerca profonda a partire dalle stesse componenti di game_state_eval
+# più alcune feature sulla matrice dei danni
+
+FEATURE_VERSION = 1
+FEATURE_NAMES = [
+  'match_up', 'my_hp', 'opp_hp', 'my_stage', 'opp_stage', 'my_status', 'opp_status',
+  'my_party0_hp', 'my_party1_hp', 'opp_party0_hp', 'opp_party1_hp', 'my_fainted', 'opp_fainted',
+  'speed_diff', 'my_max_dmg', 'my_mean_dmg', 'my_ko', 'opp_max_dmg', 'opp_mean_dmg', 'opp_ko',
+  'party_best_dmg', 'party_worst_taken', 'my_known_moves', 'opp_known_moves',
+]
+N_FEATURES = len(FEATURE_NAMES)
+
+def _hp(pkm: Pkm) -> float:
+  return pkm.hp / pkm.max_hp
+
+def _party_hp(team: PkmTeam, i: int) -> float:
+  return _hp(team.party[i]) if len(team.party) > i else 0.
+
+def _damages(attacker: Pkm, defender: Pkm, atk_team: PkmTeam, def_team: PkmTeam, weather) -> np.ndarray:
+  # danno di ogni mossa come frazione degli hp rimasti del difensore (1 = ko)
+  hp = max(defender.hp, 1.)
+  return np.array([calculate_damage(m, attacker.type, defender.type, atk_team.stage[PkmStat.ATTACK],
+                                    def_team.stage[PkmStat.DEFENSE], weather) / hp for m in attacker.moves])
+
+def state_features(g: GameState, out: np.ndarray = None) -> np.ndarray:
+  if out is None:
+    out = np.zeros(N_FEATURES, dtype=np.float32)
+  my_team, opp_team = g.teams[0], g.teams[1]
+  my_active, opp_active = my_team.active, opp_team.active
+  weather = g.weather.condition
+  opp_known = [move for move in opp_active.moves if move.name is not None]
+  my_dmg = np.minimum(_damages(my_active, opp_active, my_team, opp_team, weather), 1.)
+  opp_dmg = np.minimum(_damages(opp_active, my_active, opp_team, my_team, weather), 1.) if len(opp_known) > 0 else np.zeros(1)
+  party_dmg = [np.minimum(_damages(p, opp_active, my_team, opp_team, weather), 1.).max() for p in my_team.party if p.hp > 0]
+  party_taken = [np.minimum(_damages(opp_active, p, opp_team, my_team, weather), 1.).max() for p in my_team.party if p.hp > 0] \
+    if len(opp_known) > 0 else []
+  out[:] = [
+    match_up_eval(my_active.type, opp_active.type, [m.type for m in my_active.moves], [m.type for m in opp_known]),
+    _hp(my_active), _hp(opp_active),
+    stage_eval(my_team), stage_eval(opp_team),
+    status_eval(my_active), status_eval(opp_active),
+    _party_hp(my_team, 0), _party_hp(my_team, 1), _party_hp(opp_team, 0), _party_hp(opp_team, 1),
+    n_fainted(my_team), n_fainted(opp_team),
+    my_team.stage[PkmStat.SPEED] - opp_team.stage[PkmStat.SPEED],
+    my_dmg.max(), my_dmg.mean(), float(my_dmg.max() >= 1.),
+    opp_dmg.max(), opp_dmg.mean(), float(opp_dmg.max() >= 1.),
+    max(party_dmg, default=0.), min(party_taken, default=0.),
+    sum(m.name is not None for m in my_active.moves), len(opp_known),
+  ]
+  return out
+
+def batch_features(states: List[GameState]) -> np.ndarray:
+  X = np.zeros((len(states), N_FEATURES), dtype=np.float32)
+  for i, g in enumerate(states):
+    state_features(g, X[i])
+  return X
+
+class DistilledEvaluator():
+
+  def __init__(self, params: dict):
+    self.kind = str(params['kind'])
+    if int(params['feature_version']) != FEATURE_VERSION:
+      raise ValueError(f"model was trained on features v{int(params['feature_version'])}, current is v{FEATURE_VERSION}")
+    self.mean = params['mean'].astype(np.float32)
+    self.std = params['std'].astype(np.float32)
+    self.W1, self.b1 = params['W1'].astype(np.float32), params['b1'].astype(np.float32)
+    if self.kind == 'mlp':
+      self.W2, self.b2 = params['W2'].astype(np.float32), params['b2'].astype(np.float32)
+
+  @classmethod
+  def load(cls, path: str) -> 'DistilledEvaluator':
+    with np.load(path) as f:
+      return cls({k: f[k] for k in f.files})
+
+  def save(self, path: str) -> None:
+    params = {'kind': self.kind, 'feature_version': FEATURE_VERSION, 'mean': self.mean, 'std': self.std,
+              'W1': self.W1, 'b1': self.b1}
+    if self.kind == 'mlp':
+      params.update(W2=self.W2, b2=self.b2)
+    np.savez(path, **params)
+
+  def predict(self, X: np.ndarray) -> np.ndarray:
+    # X: (n, N_FEATURES) -> (n,), una sola passata per tutto il batch
+    Z = (X - self.mean) / self.std
+    if self.kind == 'linear':
+      return Z @ self.W1 + self.b1
+    return np.tanh(Z @ self.W1 + self.b1) @ self.W2 + self.b2
+
+  def evaluate(self, g: GameState, depth: int = 0) -> float:
+    # stessa firma di game_state_eval
+    return float(self.predict(state_features(g)[None, :])[0])
+
+def _normalization(X: np.ndarray):
+  mean = X.mean(axis=0)
+  std = X.std(axis=0)
+  std[std < 1e-6] = 1.
+  return mean.astype(np.float32), std.astype(np.float32)
+
+def fit_linear(X: np.ndarray, y: np.ndarray, l2: float = 1e-2) -> DistilledEvaluator:
+  # ridge regression in forma chiusa
+  mean, std = _normalization(X)
+  Z = np.hstack([(X - mean) / std, np.ones((len(X), 1), dtype=np.float32)]).astype(np.float64)
+  reg = l2 * np.eye(Z.shape[1])
+  reg[-1, -1] = 0.
+  w = np.linalg.solve(Z.T @ Z + reg, Z.T @ y)
+  return DistilledEvaluator({'kind': 'linear', 'feature_version': FEATURE_VERSION, 'mean': mean, 'std': std,
+                             'W1': w[:-1], 'b1': np.array(w[-1])})
+
+def fit_mlp(X: np.ndarray, y: np.ndarray, hidden: int = 32, epochs: int = 300, lr: float = 1e-2,
+            batch_size: int = 256, l2: float = 1e-4, seed: int = 0) -> DistilledEvaluator:
+  # mlp tanh a un livello, Adam su minibatch
+  rng = np.random.default_rng(seed)
+  mean, std = _normalization(X)
+  Z = ((X - mean) / std).astype(np.float64)
+  y = y.astype(np.float64)
+  params = [rng.normal(0, 1 / np.sqrt(Z.shape[1]), (Z.shape[1], hidden)), np.zeros(hidden),
+            rng.normal(0, 1 / np.sqrt(hidden), hidden), np.array(y.mean())]
+  m = [np.zeros_like(p) for p in params]
+  v = [np.zeros_like(p) for p in params]
+  t = 0
+  for _ in range(epochs):
+    order = rng.permutation(len(Z))
+    for start in range(0, len(Z), batch_size):
+      idx = order[start:start + batch_size]
+      zb, yb = Z[idx], y[idx]
+      W1, b1, W2, b2 = params
+      h = np.tanh(zb @ W1 + b1)
+      err = (h @ W2 + b2 - yb) / len(idx)
+      dh = np.outer(err, W2) * (1 - h**2)
+      grads = [zb.T @ dh + l2 * W1, dh.sum(axis=0), h.T @ err + l2 * W2, err.sum()]
+      t += 1
+      for i, g in enumerate(grads):
+        m[i] = 0.9 * m[i] + 0.1 * g
+        v[i] = 0.999 * v[i] + 0.001 * g**2
+        params[i] = params[i] - lr * (m[i] / (1 - 0.9**t)) / (np.sqrt(v[i] / (1 - 0.999**t)) + 1e-8)
+  W1, b1, W2, b2 = params
+  return DistilledEvaluator({'kind': 'mlp', 'feature_version': FEATURE_VERSION, 'mean': mean, 'std': std,
+                             'W1': W1, 'b1': b1, 'W2': W2, 'b2': np.array(b2)})
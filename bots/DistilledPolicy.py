@@ -0,0 +1,63 @@
+import os
+import random
+from copy import deepcopy
+from typing import List, Tuple
+
+import numpy as np
+
+from vgc.behaviour import BattlePolicy
+from vgc.datatypes.Objects import GameState
+
+from bots.AlphaBetaPolicy import estimate_move
+from bots.DistilledEvaluator import DistilledEvaluator, batch_features
+from bots.Endgame import valid_actions
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'distilled_eval.npz')
+
+class DistilledPolicy(BattlePolicy):
+  # ricerca a un turno (mia azione x azione avversaria) valutata dal modello distillato:
+  # tutti gli stati figli sono valutati con una sola chiamata al modello
+
+  def __init__(self, model_path: str = DEFAULT_MODEL_PATH, seed: int = 69, model: DistilledEvaluator = None):
+    # model: un modello già in memoria (Distill.py), al posto di quello in model_path
+    if model is None:
+      if not os.path.exists(model_path):
+        raise FileNotFoundError(f'{model_path} not found, train a model with Distill.py first')
+      model = DistilledEvaluator.load(model_path)
+    self.model = model
+    self.nodes = 0
+    random.seed(seed)
+
+  def get_action(self, g: GameState) -> int:
+    children, my_actions, opp_actions = self._expand(g)
+    values = self.model.predict(batch_features(children))
+    return self._maximin(values, my_actions, opp_actions)
+
+  def get_actions(self, batch: List[GameState]) -> List[int]:
+    # i figli di tutte le partite del batch (LockstepRunner) vanno al modello in una sola chiamata
+    expanded = [self._expand(g) for g in batch]
+    values = self.model.predict(batch_features([child for children, _, _ in expanded for child in children]))
+    actions = []
+    start = 0
+    for children, my_actions, opp_actions in expanded:
+      actions.append(self._maximin(values[start:start + len(children)], my_actions, opp_actions))
+      start += len(children)
+    return actions
+
+  def _expand(self, g: GameState) -> Tuple[List[GameState], List[int], List[int]]:
+    state = deepcopy(g)
+    # stimo delle mosse dell'avversario che non conosco
+    estimate_move(state.teams[1].active)
+    my_actions = valid_actions(state.teams[0])
+    opp_actions = valid_actions(state.teams[1])
+    children = []
+    for a in my_actions:
+      for b in opp_actions:
+        next_state, _, _, _, _ = deepcopy(state).step([a, b])
+        children.append(next_state[0])
+    self.nodes += len(children)
+    return children, my_actions, opp_actions
+
+  def _maximin(self, values: np.ndarray, my_actions: List[int], opp_actions: List[int]) -> int:
+    values = values.reshape(len(my_actions), len(opp_actions))
+    return my_actions[int(np.argmax(values.min(axis=1)))]
@@ -0,0 +1,135 @@
+import math
+from copy import deepcopy
+from typing import Callable, Dict, List, Tuple, Union
+
+import numpy as np
+
+from vgc.datatypes.Objects import GameState, PkmTeam
+from vgc.datatypes.Constants import DEFAULT_N_ACTIONS
+
+from bots.StateCodec import encode_state
+
+# risolutore esatto dei finali: quando a entrambi restano al massimo 2 pkm (e almeno uno dei due
+# ne ha 1 solo) la ricerca prosegue fino alla fine della partita invece di fermarsi a max_depth.
+# Durante una soluzione gli stati sono memorizzati raggruppando gli hp in fasce, così posizioni quasi uguali
+# si risolvono una volta sola; la tabella riparte vuota a ogni soluzione, perché le mosse avversarie stimate
+# cambiano da una chiamata all'altra
+
+WIN_VALUE = 1000.
+
+def alive(team: PkmTeam) -> int:
+  return sum(pkm.hp > 0 for pkm in [team.active] + list(team.party))
+
+def is_endgame(g: GameState) -> bool:
+  my_alive, opp_alive = alive(g.teams[0]), alive(g.teams[1])
+  return 0 < my_alive <= 2 and 0 < opp_alive <= 2 and min(my_alive, opp_alive) == 1
+
+def valid_actions(team: PkmTeam) -> List[int]:
+  # con l'attivo esausto si può solo cambiare, e solo verso pkm ancora in vita
+  switches = [DEFAULT_N_ACTIONS - 2 + i for i, pkm in enumerate(team.party) if pkm.hp > 0]
+  if team.active.hp <= 0:
+    return switches
+  return list(range(DEFAULT_N_ACTIONS - 2)) + switches
+
+def bucket_key(g: GameState, hp_buckets: int = 16, opp_moves: bool = True) -> bytes:
+  # stato canonico completo (StateCodec: specie, mosse e pp, status, stage, meteo) con gli hp raggruppati in fasce;
+  # con opp_moves=False le mosse dei pkm avversari restano fuori dalla chiave
+  rec = encode_state(g)
+  pkms = rec['teams']['pkms']
+  pkms['hp'] = np.ceil(pkms['hp'] / np.maximum(pkms['max_hp'], 1e-9) * hp_buckets)
+  if not opp_moves:
+    pkms['moves'][1] = 0
+  return rec.tobytes()
+
+class EndgameSolver():
+
+  def __init__(self, evaluate: Callable[[GameState, int], float], prepare: Callable[[GameState], None] = None,
+               hp_buckets: int = 16, max_plies: int = 40, max_steps: int = 20000):
+    # evaluate: valutazione euristica usata solo se si supera max_plies
+    # prepare: chiamata sulla copia dello stato prima di risolvere (es. stima delle mosse avversarie)
+    # max_steps: oltre questo numero di GameState.step per chiamata si rinuncia e la policy usa la ricerca normale
+    self.evaluate = evaluate
+    self.prepare = prepare
+    self.hp_buckets = hp_buckets
+    self.max_plies = max_plies
+    self.max_steps = max_steps
+    self.memo: Dict[bytes, float] = {}
+    self.nodes = 0
+    self.steps = 0
+
+  def key(self, g: GameState) -> bytes:
+    return bucket_key(g, self.hp_buckets)
+
+  def solve(self, g: GameState) -> Union[int, None]:
+    state = self._start(g)
+    try:
+      _, action, _ = self._solve(state, 0, set())
+    except _Budget:
+      return None
+    return action
+
+  def value(self, g: GameState) -> Union[float, None]:
+    # None se si supera max_steps, come solve
+    state = self._start(g)
+    try:
+      return self._solve(state, 0, set())[0]
+    except _Budget:
+      return None
+
+  def _start(self, g: GameState) -> GameState:
+    state = deepcopy(g)
+    if self.prepare is not None:
+      self.prepare(state)
+    self.memo.clear()
+    self.nodes = 0
+    self.steps = 0
+    return state
+
+  def _terminal(self, g: GameState) -> Union[float, None]:
+    my_alive, opp_alive = alive(g.teams[0]), alive(g.teams[1])
+    if opp_alive == 0:
+      # a parità di vittoria preferisco quella con più hp rimasti
+      return WIN_VALUE + sum(p.hp / p.max_hp for p in [g.teams[0].active] + list(g.teams[0].party))
+    if my_alive == 0:
+      return -WIN_VALUE - sum(p.hp / p.max_hp for p in [g.teams[1].active] + list(g.teams[1].party))
+    return None
+
+  def _solve(self, g: GameState, ply: int, path: set) -> Tuple[float, Union[int, None], bool]:
+    # il terzo valore dice se il risultato dipende dal cammino (una ripetizione patta o il limite max_plies):
+    # in quel caso non va memorizzato
+    terminal = self._terminal(g)
+    if terminal is not None:
+      return terminal, None, False
+    if ply >= self.max_plies:
+      return self.evaluate(g, ply), None, True
+    key = self.key(g)
+    if ply > 0 and key in self.memo:
+      return self.memo[key], None, False
+    if key in path:
+      # posizione ripetuta (nessuno riesce a fare danni): patta
+      return 0., None, True
+    self.nodes += 1
+    path.add(key)
+    best, best_action, dependent = -math.inf, None, False
+    opp_actions = valid_actions(g.teams[1])
+    for a in valid_actions(g.teams[0]):
+      worst = math.inf
+      for b in opp_actions:
+        self.steps += 1
+        if self.steps > self.max_steps:
+          raise _Budget()
+        next_state, _, _, _, _ = deepcopy(g).step([a, b])
+        v, _, d = self._solve(next_state[0], ply + 2, path)
+        dependent = dependent or d
+        worst = min(worst, v)
+        if worst <= best:
+          break
+      if worst > best:
+        best, best_action = worst, a
+    path.discard(key)
+    if not dependent:
+      self.memo[key] = best
+    return best, best_action, dependent
+
+class _Budget(Exception):
+  pass
@@ -0,0 +1,28 @@
+import json
+import os
+from typing import Dict
+
+# coefficienti di game_state_eval, condivisi da AlphaBetaPolicy e MixedPolicy e scritti da TuneEval.py
+EVAL_WEIGHTS_PATH = os.path.join(os.path.dirname(__file__), 'eval_weights.json')
+DEFAULT_WEIGHTS: Dict[str, float] = {'hp': 3., 'stage': 0.2, 'depth': 0.3, 'party_hp': 2.}
+WEIGHT_NAMES = list(DEFAULT_WEIGHTS)
+
+def load_weights(path: str = EVAL_WEIGHTS_PATH) -> Dict[str, float]:
+  weights = dict(DEFAULT_WEIGHTS)
+  if os.path.exists(path):
+    with open(path) as f:
+      loaded = json.load(f)
+    unknown = set(loaded) - set(DEFAULT_WEIGHTS)
+    if unknown:
+      raise ValueError(f'unknown eval weights in {path}: {sorted(unknown)}')
+    weights.update({k: float(v) for k, v in loaded.items()})
+  return weights
+
+def save_weights(weights: Dict[str, float], path: str = EVAL_WEIGHTS_PATH) -> None:
+  tmp = f'{path}.{os.getpid()}.tmp'
+  with open(tmp, 'w') as f:
+    json.dump({k: float(weights[k]) for k in WEIGHT_NAMES}, f, indent=2)
+    f.write('\n')
+  os.replace(tmp, path)
+
+EVAL_WEIGHTS = load_weights()
@@ -1,4 +1,3 @@
-import math
 from typing import Any, List, Union
 from copy import deepcopy
 
@@ -11,6 +10,8 @@ from vgc.datatypes.Objects import GameState, PkmTeam, PkmType, Pkm, PkmMove, Pkm
 from vgc.datatypes.Constants import DEFAULT_N_ACTIONS, TYPE_CHART_MULTIPLIER
 from vgc.competition.StandardPkmMoves import STANDARD_MOVE_ROSTER
 
+from bots.DamageRace import DamageRace, damage_race
+
   
 def match_up_eval(my_pkm_type: PkmType,
       opp_pkm_type: PkmType,
@@ -124,7 +125,12 @@ class GreedyPolicy(BattlePolicy):
   def get_action(self, g: GameState) -> int:
     return self._simple_search(g)
 
-  def _simple_search(self, g: GameState) -> int:
+  def get_actions(self, batch: List[GameState]) -> List[int]:
+    # interfaccia a batch usata da LockstepRunner: le corse al ko di tutto il batch in un solo passaggio
+    races = damage_race(batch)
+    return [self._simple_search(g, races[i]) for i, g in enumerate(batch)]
+
+  def _simple_search(self, g: GameState, race: DamageRace = None) -> int:
 
     team0 = g.teams[0]
     team1 = g.teams[1]
@@ -178,11 +184,11 @@ class GreedyPolicy(BattlePolicy):
     if match_up >= 0.5 or n_fainted(team0)==2 or (match_up < 0.5 and not (pkm1_match_up > match_up or pkm2_match_up > match_up)):
       # calcolo i danni delle mie mosse
       damages = calculateDamages(team0.stage[PkmStat.ATTACK], team1.stage[PkmStat.DEFENSE], team0.active, team1.active, weather)
-      # controllo se in 3 turni riesco a sconfiggere il nemico
-      beatMoves = [] 
-      for move in damages:
-        if move[1]*math.floor(3*move[3]) > opp_active.hp:
-          beatMoves.append(move)
+      # controllo se in 3 turni (attesi, con l'accuratezza) riesco a sconfiggere il nemico
+      if race is None:
+        race = damage_race([g])[0]
+      turns = race.turns_to_ko()
+      beatMoves = [move for move in damages if turns[move[0]] <= 3]
       # se non ho mosse che sconfiggerebbero il nemico in 3 turni controllo se ho delle mosse di stato
       if len(beatMoves) == 0:
         stateMoves = [m for m in damages if m[6]==1 and (m[5]==PkmStatus.CONFUSED or m[5]==PkmStatus.PARALYZED or m[5]==PkmStatus.SLEEP or m[5]==PkmStatus.FROZEN)]
@@ -203,12 +209,12 @@ class GreedyPolicy(BattlePolicy):
           return damages[0][0]
       # se invece ho almeno una mossa che in 3 turni sconfigge il nemico allora prendo
       else:
-        # riordino le beatMoves per prendere quella che fa più danno
-        # (anche se le mosse più potenti potrebbero essere poco accurate ma ci va bene perché è già stato considerato)
-        beatMoves.sort(reverse=True, key=lambda x : (x[1]))
+        # riordino le beatMoves per prendere prima quella che vince la corsa al ko contro ogni mossa nota
+        # dell'avversario (velocità, priorità e accuratezza comprese) e poi quella che fa più danno
+        win = race.worst_case_win()
+        beatMoves.sort(reverse=True, key=lambda x : (win[x[0]], x[1]))
         return beatMoves[0][0]
                 
-      # per ora uso un approccio greedy ma è da fare una simulazione di 2-3 turni con tutte le mosse
       #return int(np.argmax([calculate_damage(m, my_active.type, opp_active.type, team0.stage[PkmStat.ATTACK], team1.stage[PkmStat.DEFENSE], weather) for m in my_active.moves]))  
     # altrimenti (comprende il caso in cui il pkm è in svantaggio e ho pkm migliori in squadra) faccio lo switch con il pkm migliore
     else:
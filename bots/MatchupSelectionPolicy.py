@@ -0,0 +1,71 @@
+from itertools import permutations
+from typing import List, Tuple
+
+import numpy as np
+
+from vgc.behaviour import TeamSelectionPolicy
+from vgc.datatypes.Objects import Pkm, PkmFullTeam
+from vgc.datatypes.Types import WeatherCondition
+
+from bots.DamageRace import TYPE_CHART, N_MOVES, damage, moves_array, M_TYPE, M_POWER, M_FIXED, M_ACC, M_VALID
+
+# tutte le terne ordinate (il primo è il pkm che parte in campo) dei 6 pkm della squadra
+ORDERED_TRIPLES = np.array(list(permutations(range(6), 3)), dtype=np.int64)
+
+def team_arrays(pkms: List[Pkm]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+  # tipi [n], hp [n], mosse [n, 4, campi] nel formato di DamageRace
+  types = np.array([int(p.type) for p in pkms], dtype=np.int64)
+  hp = np.array([p.hp for p in pkms], dtype=np.float64)
+  moves = np.array([moves_array(p) for p in pkms], dtype=np.float64).reshape(len(pkms), N_MOVES, -1)
+  return types, hp, moves
+
+def _best_damage(att_types, att_moves, def_types) -> np.ndarray:
+  # danno atteso (con l'accuratezza) della mossa migliore di ogni attaccante contro ogni difensore: [n_att, n_def]
+  dmg = damage(att_moves[:, None, :, M_TYPE], att_moves[:, None, :, M_POWER], att_moves[:, None, :, M_FIXED],
+               att_moves[:, None, :, M_VALID] > 0, att_types[:, None, None], def_types[None, :, None], 0, 0,
+               WeatherCondition.CLEAR)
+  return (dmg * att_moves[:, None, :, M_ACC]).max(axis=-1, initial=0.)
+
+def _type_match_up(att_types, att_moves, def_types) -> np.ndarray:
+  # versione vettoriale della parte offensiva di match_up_eval: moltiplicatore di tipo massimo (con stab)
+  # delle mosse note di ogni attaccante contro ogni difensore: [n_att, n_def]
+  move_types = att_moves[..., M_TYPE].astype(np.int64)
+  rate = TYPE_CHART[move_types[:, None, :], def_types[None, :, None]]
+  rate = rate * np.where(move_types == att_types[:, None], 1.5, 1.)[:, None, :]
+  return np.where(att_moves[:, None, :, M_VALID] > 0, rate, 0.).max(axis=-1, initial=0.)
+
+def match_up_matrix(team: List[Pkm], opp_team: List[Pkm], type_weight: float = 0.25) -> np.ndarray:
+  # M[i, j] > 0 se il mio pkm i è favorito contro il pkm avversario j:
+  # corsa al ko (velocità con cui ognuno toglie hp all'altro, in [-1, 1]) + match up di tipo come in match_up_eval
+  my_types, my_hp, my_moves = team_arrays(team)
+  opp_types, opp_hp, opp_moves = team_arrays(opp_team)
+  my_rate = _best_damage(my_types, my_moves, opp_types) / np.maximum(opp_hp[None, :], 1.)
+  opp_rate = (_best_damage(opp_types, opp_moves, my_types) / np.maximum(my_hp[None, :], 1.)).T
+  with np.errstate(divide='ignore', invalid='ignore'):
+    race = np.nan_to_num((my_rate - opp_rate) / (my_rate + opp_rate))
+  offensive = _type_match_up(my_types, my_moves, opp_types)
+  defensive = _type_match_up(opp_types, opp_moves, my_types).T
+  return race + type_weight * (offensive - defensive)
+
+class MatchupSelectionPolicy(TeamSelectionPolicy):
+  # sceglie i 3 pkm da portare in battaglia e quello che parte in campo guardando la squadra avversaria:
+  # la matrice dei match up è calcolata in un solo passaggio numpy e tutte le 120 terne ordinate
+  # sono valutate insieme
+  #   copertura: per ogni avversario il match up migliore che ho tra i 3 (media e caso peggiore)
+  #   lead:      match up medio del primo pkm contro tutta la squadra avversaria
+
+  def __init__(self, type_weight: float = 0.25, lead_weight: float = 0.5, worst_weight: float = 0.5):
+    self.type_weight = type_weight
+    self.lead_weight = lead_weight
+    self.worst_weight = worst_weight
+
+  def get_action(self, d: Tuple[PkmFullTeam, PkmFullTeam]) -> List[int]:
+    team, opp_team = d
+    n = len(team.pkm_list)
+    if n < 3 or opp_team is None or len(opp_team.pkm_list) == 0:
+      return [0, 1, 2]
+    M = match_up_matrix(team.pkm_list, opp_team.pkm_list, self.type_weight)
+    triples = ORDERED_TRIPLES if n == 6 else np.array(list(permutations(range(n), 3)), dtype=np.int64)
+    cover = M[triples].max(axis=1)                   # [terne, avversari]
+    scores = cover.mean(axis=1) + self.worst_weight * cover.min(axis=1) + self.lead_weight * M[triples[:, 0]].mean(axis=1)
+    return [int(i) for i in triples[int(np.argmax(scores))]]
@@ -0,0 +1,146 @@
+import random
+import threading
+import time
+from copy import deepcopy
+from typing import Callable, Dict, Union
+
+from vgc.datatypes.Objects import GameState
+from vgc.datatypes.Constants import DEFAULT_N_ACTIONS
+
+from bots.Endgame import bucket_key, valid_actions
+
+# ricerca in background tra un turno e l'altro: dopo che la policy ha restituito l'azione, un thread cerca
+# gli stati successivi più probabili (la mia azione x le risposte dell'avversario, dalla peggiore per me)
+# e salva le decisioni in una tabella indicizzata dallo stato con gli hp a fasce, che il get_action
+# successivo consulta per prima cosa.
+# Il ponder non deve spostare la sequenza del modulo random, condivisa nel processo con l'avversario e il
+# motore: la stima delle mosse avversarie usa Ponderer.rng, e gli step del motore nel thread di ponder
+# (Ponderer.step) girano con lo stato di Ponderer.rng al posto di quello del modulo, ripristinato subito dopo.
+# Limite noto: il lock serializza solo gli step del ponder; se un altro thread estrae dal modulo random
+# proprio durante uno di questi step, prende i numeri del ponder e la sua sequenza cambia
+
+_random_lock = threading.Lock()
+
+class PonderCancelled(Exception):
+  pass
+
+class Ponderer():
+  # search(g) restituisce l'azione per lo stato g (None se non va cercato) e deve chiamare checkpoint()
+  # a ogni nodo: lì il thread si ferma se annullato e si mette in pausa per usare al massimo duty_cycle
+  # di una cpu, così non toglie tempo agli altri worker del torneo. prepare(g, rng) e search devono
+  # estrarre i numeri casuali da rng (self.rng), non dal modulo random, e fare gli step con self.step
+
+  def __init__(self, search: Callable[[GameState], Union[int, None]], prepare: Callable[[GameState, random.Random], None],
+               evaluate: Callable[[GameState, int], float], duty_cycle: float = 0.5, time_slice: float = 0.01,
+               hp_buckets: int = 16, max_successors: int = DEFAULT_N_ACTIONS, seed: int = None):
+    self.search = search
+    self.prepare = prepare
+    self.rng = random.Random(seed)
+    self.evaluate = evaluate
+    self.duty_cycle = duty_cycle
+    self.time_slice = time_slice
+    self.hp_buckets = hp_buckets
+    self.max_successors = max_successors
+    self.table: Dict[tuple, int] = {}
+    self.hits = 0
+    self.misses = 0
+    self._init_thread_state()
+
+  def _init_thread_state(self) -> None:
+    self.lock = threading.Lock()
+    self.cancel = threading.Event()
+    self.thread: threading.Thread = None
+    self._ident = None
+    self._slice_start = 0.
+
+  def __getstate__(self):
+    # il thread e i lock non passano tra processi
+    self.stop()
+    state = self.__dict__.copy()
+    for k in ('lock', 'cancel', 'thread', '_ident', '_slice_start'):
+      del state[k]
+    return state
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self._init_thread_state()
+
+  def start(self, g: GameState, action: int) -> None:
+    # da chiamare dopo aver scelto action nello stato g (che viene copiato)
+    self.stop()
+    state = deepcopy(g)
+    self.prepare(state, self.rng)
+    self.table = {}
+    self.thread = threading.Thread(target=self._run, args=(state, action), name='ponder', daemon=True)
+    self.thread.start()
+
+  def stop(self) -> None:
+    if self.thread is not None:
+      self.cancel.set()
+      self.thread.join()
+      self.thread = None
+      self._ident = None
+    self.cancel.clear()
+
+  def lookup(self, g: GameState) -> Union[int, None]:
+    # ferma il thread e restituisce la decisione già trovata per g, se c'è
+    self.stop()
+    with self.lock:
+      action = self.table.get(self.key(g))
+    if action is None:
+      self.misses += 1
+    else:
+      self.hits += 1
+    return action
+
+  def key(self, g: GameState) -> bytes:
+    # senza le mosse avversarie: negli stati cercati sono stimate, nello stato vero del turno dopo restano ignote
+    return bucket_key(g, self.hp_buckets, opp_moves=False)
+
+  def step(self, g: GameState, actions):
+    # g.step(actions); nel thread di ponder i lanci del motore vengono da self.rng
+    if threading.get_ident() != self._ident:
+      return g.step(actions)
+    with _random_lock:
+      saved = random.getstate()
+      random.setstate(self.rng.getstate())
+      try:
+        return g.step(actions)
+      finally:
+        self.rng.setstate(random.getstate())
+        random.setstate(saved)
+
+  def checkpoint(self) -> None:
+    # chiamato dalla ricerca a ogni nodo; non fa nulla se non siamo nel thread di ponder
+    if threading.get_ident() != self._ident:
+      return
+    if self.cancel.is_set():
+      raise PonderCancelled()
+    busy = time.perf_counter() - self._slice_start
+    if busy >= self.time_slice:
+      # pausa proporzionale al lavoro fatto: busy / (busy + pausa) = duty_cycle
+      if self.cancel.wait(busy * (1 - self.duty_cycle) / self.duty_cycle):
+        raise PonderCancelled()
+      self._slice_start = time.perf_counter()
+
+  def _run(self, state: GameState, action: int) -> None:
+    self._ident = threading.get_ident()
+    self._slice_start = time.perf_counter()
+    try:
+      successors = []
+      for opp_action in valid_actions(state.teams[1]):
+        self.checkpoint()
+        next_state, _, _, _, _ = self.step(deepcopy(state), [action, opp_action])
+        successors.append(next_state[0])
+      # prima le risposte migliori per l'avversario
+      successors.sort(key=lambda s: self.evaluate(s, 0))
+      for s in successors[:self.max_successors]:
+        key = self.key(s)
+        if key in self.table:
+          continue
+        pondered = self.search(s)
+        if pondered is not None:
+          with self.lock:
+            self.table[key] = pondered
+    except PonderCancelled:
+      pass
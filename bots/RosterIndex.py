@@ -0,0 +1,62 @@
+from typing import Iterable, List
+
+import numpy as np
+
+from vgc.datatypes.Objects import PkmTemplate
+from vgc.datatypes.Types import WeatherCondition
+from vgc.datatypes.Constants import TYPE_CHART_MULTIPLIER
+
+from bots.DamageRace import TYPE_CHART, damage
+
+N_TYPES = len(TYPE_CHART_MULTIPLIER)
+
+class RosterIndex():
+  # il roster trasformato in array, calcolati una volta sola per tutte le squadre da costruire:
+  #   types[N], max_hp[N]
+  #   move_types[N, K], powers[N, K], accs[N, K], move_mask[N, K]   (K = move roster più lungo, padding a 0)
+  #   move_damage[N, K, T]: danno atteso (accuratezza, stab, tipo) di ogni mossa contro un difensore di ogni tipo
+
+  def __init__(self, roster: Iterable[PkmTemplate]):
+    self.templates: List[PkmTemplate] = list(roster)
+    self.move_rosters = [list(t.move_roster) for t in self.templates]
+    N = len(self.templates)
+    K = max((len(m) for m in self.move_rosters), default=0)
+    self.types = np.array([int(t.type) for t in self.templates], dtype=np.int64)
+    self.max_hp = np.array([t.max_hp for t in self.templates], dtype=np.float64)
+    self.move_types = np.zeros((N, K), dtype=np.int64)
+    self.powers = np.zeros((N, K))
+    self.fixed = np.zeros((N, K))
+    self.accs = np.zeros((N, K))
+    self.move_mask = np.zeros((N, K), dtype=bool)
+    for i, moves in enumerate(self.move_rosters):
+      k = len(moves)
+      self.move_types[i, :k] = [int(m.type) for m in moves]
+      self.powers[i, :k] = [m.power for m in moves]
+      self.fixed[i, :k] = [m.fixed_damage for m in moves]
+      self.accs[i, :k] = [m.acc for m in moves]
+      self.move_mask[i, :k] = True
+    defender = np.arange(N_TYPES)[None, None, :]
+    self.move_damage = damage(self.move_types[..., None], self.powers[..., None], self.fixed[..., None],
+                              self.move_mask[..., None], self.types[:, None, None], defender, 0, 0,
+                              WeatherCondition.CLEAR) * self.accs[..., None]
+
+  def __len__(self) -> int:
+    return len(self.templates)
+
+  def type_frequency(self) -> np.ndarray:
+    # quota di pkm del roster di ogni tipo: la distribuzione dei tipi che ci si aspetta dagli avversari
+    freq = np.bincount(self.types, minlength=N_TYPES).astype(np.float64)
+    return freq / max(freq.sum(), 1.)
+
+  def mean_hp(self) -> float:
+    return float(self.max_hp.mean()) if len(self) else 1.
+
+  def mean_stab_damage(self) -> np.ndarray:
+    # danno medio delle mosse stab dei pkm di ogni tipo contro ogni tipo: [attaccante T, difensore T]
+    # (la minaccia che rappresenta un avversario di quel tipo)
+    stab = self.move_mask & (self.move_types == self.types[:, None])
+    out = np.zeros((N_TYPES, N_TYPES))
+    counts = np.zeros(N_TYPES)
+    np.add.at(out, self.types, (self.move_damage * stab[..., None]).sum(axis=1))
+    np.add.at(counts, self.types, stab.sum(axis=1))
+    return out / np.maximum(counts, 1.)[:, None]
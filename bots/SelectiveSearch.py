@@ -0,0 +1,150 @@
+from typing import Dict, Tuple, Union
+
+import numpy as np
+
+from vgc.datatypes.Types import PkmStatus, WeatherCondition, PkmEntryHazard
+from vgc.datatypes.Objects import GameState, PkmMove
+from vgc.datatypes.Constants import DEFAULT_N_ACTIONS, TYPE_CHART_MULTIPLIER
+
+from bots.DamageRace import DamageRace, N_MOVES, damage_race
+
+# ricerca selettiva per AlphaBetaPolicy e MixedPolicy: nei nodi max (le mie azioni) si usa la corsa al ko
+# di DamageRace come stima statica delle azioni per
+#   ordering:   provare prima le azioni più promettenti (più tagli alpha-beta)
+#   immunity:   scartare le mosse senza effetti secondari contro un tipo immune e i cambi verso pkm esausti
+#   lmr:        late move reductions, le azioni in fondo all'ordine e con stima bassa si cercano con meno
+#               profondità e si ricercano a profondità piena solo se migliorano alpha
+#   futility:   vicino all'orizzonte, se la valutazione statica più il massimo guadagno possibile in un turno
+#               con una mossa non arriva ad alpha le mosse non vengono cercate; i cambi si cercano sempre,
+#               perché cambiano match up e hp in campo più di quanto stimi il margine
+#   extensions: all'orizzonte, se qualcuno può andare ko al prossimo colpo si cerca un turno in più
+# ogni regola si attiva a parte e ha un contatore in policy.selective_stats
+
+class SelectiveConfig():
+
+  def __init__(self, ordering: bool = True, immunity: bool = True, lmr: bool = True, futility: bool = True,
+               extensions: bool = True, lmr_after: int = 3, lmr_score: float = 0.5, lmr_reduction: int = 2,
+               futility_margin: float = 1.0, ko_turns: float = 1.0, max_extensions: int = 2):
+    # lmr_after: posizione nell'ordine da cui si riduce; lmr_score: stima sotto cui si riduce;
+    # lmr_reduction, max_extensions: in ply (2 ply = un turno); futility_margin: margine per stage e status
+    # di una mossa, oltre agli hp che si possono togliere in un turno; ko_turns: turni attesi entro cui
+    # un ko è imminente
+    self.ordering = ordering
+    self.immunity = immunity
+    self.lmr = lmr
+    self.futility = futility
+    self.extensions = extensions
+    self.lmr_after = lmr_after
+    self.lmr_score = lmr_score
+    self.lmr_reduction = lmr_reduction
+    self.futility_margin = futility_margin
+    self.ko_turns = ko_turns
+    self.max_extensions = max_extensions
+
+  def __repr__(self):
+    # entra nella chiave della cache delle decisioni
+    return 'SelectiveConfig(' + ', '.join(f'{k}={v}' for k, v in self.__dict__.items()) + ')'
+
+def make_config(selective: Union[bool, dict, SelectiveConfig, None]) -> Union[SelectiveConfig, None]:
+  # selective dei costruttori delle policy: True per i valori di default, un dict (da config json) o una SelectiveConfig
+  if selective is None or selective is False:
+    return None
+  if selective is True:
+    return SelectiveConfig()
+  if isinstance(selective, dict):
+    return SelectiveConfig(**selective)
+  return selective
+
+def new_stats() -> Dict[str, int]:
+  return {'ordered': 0, 'immunity': 0, 'lmr': 0, 'lmr_research': 0, 'futility': 0, 'extension': 0}
+
+def has_side_effect(move: PkmMove) -> bool:
+  return (move.status != PkmStatus.NONE or move.stage != 0 or move.recover != 0 or
+          move.weather != WeatherCondition.CLEAR or move.hazard != PkmEntryHazard.NONE)
+
+def useless_action(g: GameState, action: int) -> bool:
+  team = g.teams[0]
+  if action >= N_MOVES:
+    i = action - N_MOVES
+    return i >= len(team.party) or team.party[i].hp <= 0
+  move = team.active.moves[action]
+  return TYPE_CHART_MULTIPLIER[move.type][g.teams[1].active.type] == 0 and not has_side_effect(move)
+
+def action_scores(race: DamageRace) -> np.ndarray:
+  # stima statica di ogni mia azione: esito della corsa al ko contro la risposta migliore + ko per turno
+  with np.errstate(divide='ignore'):
+    rate = 1. / race.turns_to_ko()
+  return race.worst_case_win() + np.minimum(rate, 1.)
+
+def imminent_ko(race: DamageRace, ko_turns: float) -> bool:
+  mine = race.turns_to_ko()[:N_MOVES].min()
+  theirs = np.where(race.opp_valid, race.opp_ttk[0], np.inf).min()
+  return bool(mine <= ko_turns or theirs <= ko_turns)
+
+def selective_max_value(policy, node, state: GameState, alpha: float, beta: float, evaluate) -> Tuple[float, Union[int, None]]:
+  # nodo max di policy._max_value con le regole di policy.selective; node.offset sposta l'orizzonte
+  # (> 0 ridotto, < 0 esteso), node.extensions conta le estensioni già usate sul cammino
+  config, stats = policy.selective, policy.selective_stats
+  if state.teams[1].active.hp == 0 or state.teams[0].active.hp == 0:
+    return evaluate(state, node.depth), None
+  race = damage_race([state])[0]
+  horizon = policy.max_depth - node.offset
+  offset, extensions = node.offset, node.extensions
+  if node.depth >= horizon:
+    if not (config.extensions and extensions < config.max_extensions and imminent_ko(race, config.ko_turns)):
+      return evaluate(state, node.depth), None
+    stats['extension'] += 1
+    offset -= 2
+    extensions += 2
+    horizon += 2
+  # nodo di frontiera (resta al massimo un turno): limite superiore del valore di ogni mia mossa
+  futile = -np.inf
+  if config.futility and horizon - node.depth <= 2 and alpha > -np.inf and not imminent_ko(race, config.ko_turns):
+    rate = 1. / race.turns_to_ko()[:N_MOVES].min()
+    bound = evaluate(state, node.depth) + config.futility_margin + policy.weights['hp'] * min(rate, 1.)
+    if bound <= alpha:
+      futile = bound
+
+  actions = list(range(DEFAULT_N_ACTIONS))
+  if futile > -np.inf:
+    switches = [a for a in actions if a >= N_MOVES]
+    stats['futility'] += len(actions) - len(switches)
+    actions = switches
+  if config.immunity:
+    useful = [a for a in actions if not useless_action(state, a)]
+    if useful:
+      stats['immunity'] += len(actions) - len(useful)
+      actions = useful
+  scores = action_scores(race)
+  if config.ordering:
+    actions.sort(key=lambda a: -scores[a])
+    stats['ordered'] += 1
+
+  # le mosse scartate valgono al massimo futile (<= alpha)
+  value, move = futile, actions[0]
+  for k, a in enumerate(actions):
+    child = type(node)()
+    child.parent = node
+    child.depth = node.depth + 1
+    child.action = a
+    child.gameState = state
+    child.offset = offset
+    child.extensions = extensions
+    reduce = (config.lmr and k >= config.lmr_after and scores[a] < config.lmr_score
+              and horizon - child.depth > config.lmr_reduction)
+    if reduce:
+      stats['lmr'] += 1
+      child.offset += config.lmr_reduction
+      child.value, _ = policy._min_value(child, alpha, beta)
+      if child.value > alpha:
+        stats['lmr_research'] += 1
+        child.offset -= config.lmr_reduction
+        child.value, _ = policy._min_value(child, alpha, beta)
+    else:
+      child.value, _ = policy._min_value(child, alpha, beta)
+    if child.value > value:
+      value, move = child.value, a
+      alpha = max(value, alpha)
+    if value >= beta:
+      return value, move
+  return value, move
@@ -0,0 +1,138 @@
+from typing import Dict
+
+import numpy as np
+
+from vgc.datatypes.Types import PkmType, PkmStatus, PkmStat, WeatherCondition, PkmEntryHazard
+from vgc.datatypes.Objects import GameState, PkmTeam, Pkm, PkmMove
+from vgc.competition.StandardPkmMoves import STANDARD_MOVE_ROSTER
+
+# rappresentazione a dimensione fissa di un GameState come record numpy: serve per salvare
+# traiettorie in binario e come forma canonica dello stato (es. per le chiavi di una cache)
+
+N_MOVES = 4
+N_TEAM = 3
+# capacità massima delle liste di stage ed entry hazard del team (quelle reali sono più corte)
+MAX_STAGES = 8
+MAX_HAZARDS = 4
+
+# indice del nome mossa: >= 0 posizione in STANDARD_MOVE_ROSTER
+NO_NAME = -1
+UNKNOWN_NAME = -2
+
+MOVE_DTYPE = np.dtype([
+  ('name', '<i2'), ('power', '<f4'), ('acc', '<f4'), ('max_pp', 'u1'), ('pp', 'u1'), ('type', 'i1'),
+  ('priority', '?'), ('prob', '<f4'), ('target', 'u1'), ('recover', '<f4'), ('status', 'i1'), ('stat', 'i1'),
+  ('stage', 'i1'), ('fixed_damage', '<f4'), ('weather', 'i1'), ('hazard', 'i1')])
+
+PKM_DTYPE = np.dtype([
+  ('type', 'i1'), ('max_hp', '<f4'), ('hp', '<f4'), ('status', 'i1'), ('n_turns_asleep', 'u1'), ('pkm_id', '<i4'),
+  ('moves', MOVE_DTYPE, (N_MOVES,))])
+
+TEAM_DTYPE = np.dtype([
+  ('pkms', PKM_DTYPE, (N_TEAM,)), ('n_pkms', 'u1'), ('n_stages', 'u1'), ('stage', 'i1', (MAX_STAGES,)),
+  ('confused', '?'), ('n_turns_confused', 'u1'), ('n_hazards', 'u1'), ('entry_hazard', 'u1', (MAX_HAZARDS,))])
+
+STATE_DTYPE = np.dtype([('teams', TEAM_DTYPE, (2,)), ('weather', 'i1'), ('n_turns_no_clear', 'u1')])
+
+_move_index: Dict[str, int] = {}
+
+def move_index(move: PkmMove) -> int:
+  if move.name is None:
+    return NO_NAME
+  if len(_move_index) == 0:
+    for i, m in enumerate(STANDARD_MOVE_ROSTER):
+      _move_index.setdefault(m.name, i)
+  return _move_index.get(move.name, UNKNOWN_NAME)
+
+def _encode_move(move: PkmMove, out) -> None:
+  out['name'] = move_index(move)
+  out['power'] = move.power
+  out['acc'] = move.acc
+  out['max_pp'] = move.max_pp
+  out['pp'] = max(move.pp, 0)
+  out['type'] = int(move.type)
+  out['priority'] = bool(move.priority)
+  out['prob'] = move.prob
+  out['target'] = move.target
+  out['recover'] = move.recover
+  out['status'] = int(move.status)
+  out['stat'] = int(move.stat)
+  out['stage'] = move.stage
+  out['fixed_damage'] = move.fixed_damage
+  out['weather'] = int(move.weather)
+  out['hazard'] = int(move.hazard)
+
+def _encode_pkm(pkm: Pkm, out) -> None:
+  out['type'] = int(pkm.type)
+  out['max_hp'] = pkm.max_hp
+  out['hp'] = pkm.hp
+  out['status'] = int(pkm.status)
+  out['n_turns_asleep'] = pkm.n_turns_asleep
+  out['pkm_id'] = pkm.pkm_id
+  for i, move in enumerate(pkm.moves[:N_MOVES]):
+    _encode_move(move, out['moves'][i])
+
+def _encode_team(team: PkmTeam, out) -> None:
+  pkms = [team.active] + list(team.party)
+  out['n_pkms'] = len(pkms)
+  for i, pkm in enumerate(pkms[:N_TEAM]):
+    _encode_pkm(pkm, out['pkms'][i])
+  out['n_stages'] = len(team.stage)
+  out['stage'][:len(team.stage)] = team.stage
+  out['confused'] = team.confused
+  out['n_turns_confused'] = team.n_turns_confused
+  out['n_hazards'] = len(team.entry_hazard)
+  out['entry_hazard'][:len(team.entry_hazard)] = team.entry_hazard
+
+def encode_state(g: GameState, out=None):
+  # out: record (o vista su un array) di tipo STATE_DTYPE da riempire, altrimenti ne crea uno
+  if out is None:
+    out = np.zeros((), dtype=STATE_DTYPE)
+  for i in range(2):
+    _encode_team(g.teams[i], out['teams'][i])
+  out['weather'] = int(g.weather.condition)
+  out['n_turns_no_clear'] = g.weather.n_turns_no_clear
+  return out
+
+def state_bytes(g: GameState) -> bytes:
+  return encode_state(g).tobytes()
+
+def _decode_move(rec) -> PkmMove:
+  idx = int(rec['name'])
+  if idx >= 0:
+    name = STANDARD_MOVE_ROSTER[idx].name
+  elif idx == UNKNOWN_NAME:
+    name = '?'
+  else:
+    name = None
+  move = PkmMove(power=float(rec['power']), acc=float(rec['acc']), max_pp=int(rec['max_pp']),
+                 move_type=PkmType(int(rec['type'])), name=name, priority=bool(rec['priority']),
+                 prob=float(rec['prob']), target=int(rec['target']), recover=float(rec['recover']),
+                 status=PkmStatus(int(rec['status'])), stat=PkmStat(int(rec['stat'])), stage=int(rec['stage']),
+                 fixed_damage=float(rec['fixed_damage']), weather=WeatherCondition(int(rec['weather'])),
+                 hazard=PkmEntryHazard(int(rec['hazard'])))
+  move.pp = int(rec['pp'])
+  return move
+
+def _decode_pkm(rec) -> Pkm:
+  pkm = Pkm([_decode_move(rec['moves'][i]) for i in range(N_MOVES)], PkmType(int(rec['type'])),
+            float(rec['max_hp']), PkmStatus(int(rec['status'])), int(rec['pkm_id']))
+  pkm.hp = float(rec['hp'])
+  pkm.n_turns_asleep = int(rec['n_turns_asleep'])
+  return pkm
+
+def _decode_team(rec) -> PkmTeam:
+  team = PkmTeam([_decode_pkm(rec['pkms'][i]) for i in range(int(rec['n_pkms']))])
+  team.stage = [int(s) for s in rec['stage'][:int(rec['n_stages'])]]
+  team.confused = bool(rec['confused'])
+  team.n_turns_confused = int(rec['n_turns_confused'])
+  team.entry_hazard = [int(h) for h in rec['entry_hazard'][:int(rec['n_hazards'])]]
+  return team
+
+def decode_state(rec) -> GameState:
+  # ricostruisce uno stato su cui si può chiamare step(), come quelli che riceve get_action
+  from vgc.engine.PkmBattleEnv import PkmBattleEnv
+  g = PkmBattleEnv((_decode_team(rec['teams'][0]), _decode_team(rec['teams'][1])), encode=(False, False))
+  g.weather.condition = WeatherCondition(int(rec['weather']))
+  g.weather.n_turns_no_clear = int(rec['n_turns_no_clear'])
+  return g
@@ -1,17 +1,19 @@
-from bots.AlphaBetaPolicy import AlphaBetaPolicy
-
 from vgc.behaviour import BattlePolicy, TeamSelectionPolicy, TeamBuildPolicy
 from vgc.competition.Competitor import Competitor
-from vgc.behaviour.TeamSelectionPolicies import FirstEditionTeamSelectionPolicy
-from vgc.behaviour.TeamBuildPolicies import RandomTeamBuilder
+
+from bots.CoverageTeamBuildPolicy import CoverageTeamBuildPolicy
+from bots.MatchupSelectionPolicy import MatchupSelectionPolicy
 
 class fCompetitor(Competitor):
 
-  def __init__(self, name: str = 'fCompetitor'):
+  def __init__(self, name: str = 'fCompetitor', battle_policy: BattlePolicy = None):
     self._name = name
-    self._battle_policy = AlphaBetaPolicy()
-    self._team_selection_policy = FirstEditionTeamSelectionPolicy()
-    self._team_build_policy = RandomTeamBuilder()
+    if battle_policy is None:
+      from bots.AlphaBetaPolicy import AlphaBetaPolicy
+      battle_policy = AlphaBetaPolicy()
+    self._battle_policy = battle_policy
+    self._team_selection_policy = MatchupSelectionPolicy()
+    self._team_build_policy = CoverageTeamBuildPolicy()
 
   @property
   def name(self):
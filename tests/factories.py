@@ -0,0 +1,27 @@
+from typing import List, Sequence, Tuple
+
+from vgc.datatypes.Types import PkmType
+from vgc.datatypes.Objects import Pkm, PkmMove, PkmTeam
+from vgc.engine.PkmBattleEnv import PkmBattleEnv
+
+# costruzione di stati di battaglia piccoli e deterministici per i test (tutte le mosse note)
+
+def make_move(power: float = 60., move_type: PkmType = PkmType.NORMAL, acc: float = 1., priority: bool = False,
+              name: str = None, max_pp: int = 10) -> PkmMove:
+  return PkmMove(power=power, acc=acc, max_pp=max_pp, move_type=move_type, name=name or f'{move_type.name}-{power}',
+                 priority=priority)
+
+def make_pkm(pkm_type: PkmType = PkmType.NORMAL, hp: float = 200., moves: Sequence[PkmMove] = None,
+             pkm_id: int = 0) -> Pkm:
+  moves = list(moves) if moves is not None else [make_move(60., pkm_type), make_move(40.), make_move(80., PkmType.FIGHT),
+                                                 make_move(0., PkmType.PSYCHIC)]
+  return Pkm(moves, pkm_type, hp, pkm_id=pkm_id)
+
+def make_state(mine: List[Pkm], theirs: List[Pkm], hp: Tuple[Sequence[float], Sequence[float]] = None) -> PkmBattleEnv:
+  # mine/theirs: attivo per primo; hp: hp correnti per lato (default pieni)
+  teams = (PkmTeam(mine), PkmTeam(theirs))
+  if hp is not None:
+    for team, values in zip(teams, hp):
+      for pkm, value in zip([team.active] + list(team.party), values):
+        pkm.hp = value
+  return PkmBattleEnv(teams, encode=(False, False))
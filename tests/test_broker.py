@@ -0,0 +1,46 @@
+import operator
+import socket
+
+import pytest
+
+from Broker import TaskBoard, coordinator_authkey, run_tasks
+
+def test_task_fails_after_max_attempts():
+  board = TaskBoard(max_attempts=3)
+  board.add_task(0, ())
+  attempts = 0
+  while not board.done():
+    task_id, _ = board.get_task('w')
+    attempts += 1
+    board.put_error('w', task_id, 'boom')
+  assert attempts == 3
+  assert board.failed() == {0: 'boom'}
+
+def test_expired_lease_is_requeued():
+  board = TaskBoard()
+  board.add_task(0, ('payload',))
+  assert board.get_task('w') == (0, ('payload',))
+  assert board.requeue_expired(timeout=-1.) == [0]
+  assert board.get_task('other') == (0, ('payload',))
+  board.put_result('other', 0, 'result')
+  assert board.done() and board.results() == {0: 'result'}
+
+@pytest.mark.parametrize('host', ['0.0.0.0', '', '192.168.1.10', 'coordinator-host'])
+def test_non_loopback_bind_needs_an_authkey(host):
+  with pytest.raises(ValueError):
+    coordinator_authkey(host)
+  assert coordinator_authkey(host, b'secret') == b'secret'
+
+def test_loopback_bind_generates_an_authkey():
+  assert coordinator_authkey('127.0.0.1') != coordinator_authkey('localhost')
+
+def free_port():
+  with socket.socket() as s:
+    s.bind(('127.0.0.1', 0))
+    return s.getsockname()[1]
+
+def test_broker_releases_its_port():
+  # due run di fila sulla stessa porta, nello stesso processo
+  address = ('127.0.0.1', free_port())
+  for _ in range(2):
+    assert run_tasks([(1,), (2,)], address, b'secret', local_workers=1, poll=0.1, handler=operator.neg) == [-1, -2]
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('vgc')
+
+from vgc.datatypes.Types import PkmType
+from vgc.datatypes.Objects import PkmTemplate
+from vgc.datatypes.Constants import DEFAULT_PKM_N_MOVES, TYPE_CHART_MULTIPLIER
+
+from bots.CoverageTeamBuildPolicy import CoverageTeamBuildPolicy, TEAM_SIZE
+from bots.RosterIndex import N_TYPES, RosterIndex
+from factories import make_move
+
+TYPES = [PkmType.FIRE, PkmType.WATER, PkmType.GRASS, PkmType.ELECTRIC, PkmType.ROCK, PkmType.ICE, PkmType.GROUND,
+         PkmType.FLYING]
+
+def template(pkm_type, powers=(90., 60., 40., 20.), hp=200., pkm_id=0):
+  # la prima mossa stab, le altre di tipi diversi
+  types = [pkm_type, PkmType.NORMAL, PkmType.FIGHT, PkmType.WATER]
+  return PkmTemplate([make_move(p, t) for p, t in zip(powers, types)], pkm_type, hp, pkm_id)
+
+def roster(n=len(TYPES)):
+  return [template(TYPES[i % len(TYPES)], pkm_id=i) for i in range(n)]
+
+def test_index_arrays():
+  index = RosterIndex([template(PkmType.FIRE), template(PkmType.WATER, powers=(50., 30.), hp=150.)])
+  assert len(index) == 2
+  assert index.types.tolist() == [int(PkmType.FIRE), int(PkmType.WATER)]
+  assert index.max_hp.tolist() == [200., 150.]
+  # il secondo roster ha due mosse: padding a 0 e fuori dalla maschera
+  assert index.move_mask.tolist() == [[True] * 4, [True, True, False, False]]
+  assert index.powers[1].tolist() == [50., 30., 0., 0.]
+  assert index.move_damage.shape == (2, 4, N_TYPES)
+  assert np.all(index.move_damage[1, 2:] == 0)
+
+def test_index_damage_follows_the_type_chart():
+  index = RosterIndex([template(PkmType.FIRE)])
+  fire = index.move_damage[0, 0]
+  grass, water = int(PkmType.GRASS), int(PkmType.WATER)
+  # stab, super efficace contro erba e poco efficace contro acqua
+  assert fire[grass] > fire[water] > 0
+  assert fire[grass] / fire[water] == pytest.approx(TYPE_CHART_MULTIPLIER[PkmType.FIRE][PkmType.GRASS] /
+                                                    TYPE_CHART_MULTIPLIER[PkmType.FIRE][PkmType.WATER])
+
+def test_type_frequency_and_mean_hp():
+  index = RosterIndex([template(PkmType.FIRE, hp=100.), template(PkmType.FIRE, hp=200.), template(PkmType.WATER, hp=300.)])
+  freq = index.type_frequency()
+  assert freq.sum() == pytest.approx(1.)
+  assert freq[int(PkmType.FIRE)] == pytest.approx(2 / 3)
+  assert index.mean_hp() == 200.
+  assert RosterIndex([]).mean_hp() == 1.
+
+def test_mean_stab_damage_counts_only_stab_moves():
+  index = RosterIndex([template(PkmType.FIRE)])
+  threat = index.mean_stab_damage()
+  assert np.allclose(threat[int(PkmType.FIRE)], index.move_damage[0, 0])
+  assert np.all(np.delete(threat, int(PkmType.FIRE), axis=0) == 0)
+
+def test_builds_a_team_of_distinct_pkm():
+  policy = CoverageTeamBuildPolicy(time_budget=0.05)
+  pool = roster(12)
+  policy.set_roster(pool)
+  team = policy.get_action(None)
+  ids = [p.pkm_id for p in team.pkm_list]
+  assert len(ids) == TEAM_SIZE == len(set(ids))
+  for pkm in team.pkm_list:
+    assert len(pkm.moves) == DEFAULT_PKM_N_MOVES
+    assert len({id(m) for m in pkm.moves}) == DEFAULT_PKM_N_MOVES
+
+def team_score(policy, team):
+  members = policy.match_up[team]
+  return float(policy._score(members.max(axis=0), members.sum(axis=0), TEAM_SIZE))
+
+def test_search_never_loses_to_the_beam():
+  # ricerca locale e ripartenze tengono la squadra migliore, qualunque sia il tempo a disposizione
+  policy = CoverageTeamBuildPolicy(time_budget=0.05, seed=1)
+  policy.set_roster(roster(16))
+  beam = policy.pool[policy._beam_search(policy.match_up[policy.pool])]
+  assert team_score(policy, policy.search()) >= team_score(policy, beam) - 1e-12
+
+def test_few_moves_are_padded_with_the_first_choice():
+  # un template con due mosse, la seconda più forte: prima la seconda, poi la prima, poi la prima scelta ripetuta
+  pool = roster(TEAM_SIZE) + [template(PkmType.DRAGON, powers=(10., 80.), pkm_id=99)]
+  policy = CoverageTeamBuildPolicy()
+  policy.set_roster(pool)
+  assert policy.moves[-1].tolist() == [1, 0, 1, 1]
+
+def test_the_exact_roster_size_builds_the_whole_roster():
+  # sei pkm e uno scarto di uno: nessuna ripartenza possibile, la squadra resta valida
+  for n in (TEAM_SIZE, TEAM_SIZE + 1):
+    policy = CoverageTeamBuildPolicy(time_budget=0.05)
+    policy.set_roster(roster(n))
+    team = policy.search()
+    assert len(set(team)) == TEAM_SIZE and set(team) <= set(range(n))
+
+def test_small_roster_is_rejected():
+  policy = CoverageTeamBuildPolicy()
+  with pytest.raises(ValueError):
+    policy.set_roster(roster(TEAM_SIZE - 1))
+  # i pkm senza mosse non contano
+  with pytest.raises(ValueError):
+    policy.set_roster(roster(TEAM_SIZE - 1) + [PkmTemplate([], PkmType.FIRE, 200.)])
+  assert policy.index is None
+
+def test_get_action_needs_a_roster():
+  policy = CoverageTeamBuildPolicy()
+  assert policy.moves is None and policy.pool is None
+  with pytest.raises(ValueError):
+    policy.get_action(None)
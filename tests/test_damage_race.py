@@ -0,0 +1,97 @@
+import math
+
+import numpy as np
+import pytest
+
+pytest.importorskip('vgc')
+
+from vgc.datatypes.Types import PkmStat, PkmType, WeatherCondition
+from vgc.datatypes.Objects import PkmMove
+
+from bots.DamageRace import N_MOVES, damage_race
+from bots.GreedyPolicy import calculate_damage
+from factories import make_move, make_pkm, make_state
+
+def states():
+  # tre posizioni diverse: tipi, hp, stage, meteo, priorità, danno fisso, pp finiti, mosse avversarie ignote, ko in panchina
+  a = make_state([make_pkm(PkmType.FIRE, 180.), make_pkm(PkmType.WATER, 200.), make_pkm(PkmType.GRASS, 90.)],
+                 [make_pkm(PkmType.GRASS, 150.), make_pkm(PkmType.ROCK), make_pkm(PkmType.ICE)])
+  b = make_state([make_pkm(PkmType.ELECTRIC, 60., [make_move(90., PkmType.ELECTRIC), make_move(40., priority=True),
+                                                  make_move(0.), make_move(70., PkmType.GROUND, acc=.7)]),
+                  make_pkm(PkmType.GROUND, 240.), make_pkm(PkmType.FLYING, 120.)],
+                 [make_pkm(PkmType.WATER, 220., [make_move(90., PkmType.WATER), make_move(60., PkmType.ICE, acc=.8),
+                                                 make_move(40., priority=True), PkmMove(name=None)]),
+                  make_pkm(), make_pkm()],
+                 hp=([60., 0., 120.], [200., 200., 200.]))
+  b.teams[0].stage[PkmStat.ATTACK] = 2
+  b.teams[1].stage[PkmStat.DEFENSE] = -1
+  b.teams[1].stage[PkmStat.SPEED] = 1
+  b.weather.condition = WeatherCondition.RAIN
+  fixed = make_move(0., PkmType.GHOST)
+  fixed.fixed_damage = 45.
+  c = make_state([make_pkm(PkmType.PSYCHIC, 100., [fixed, make_move(80., PkmType.PSYCHIC), make_move(120., PkmType.FIRE, acc=.5),
+                                                   make_move(50., PkmType.FIGHT)]),
+                  make_pkm(PkmType.STEEL, 140.), make_pkm(PkmType.DRAGON, 160.)],
+                 [make_pkm(PkmType.FIGHT, 130.), make_pkm(), make_pkm()])
+  c.teams[0].active.moves[3].pp = 0
+  c.teams[0].stage[PkmStat.SPEED] = 1
+  c.weather.condition = WeatherCondition.SUNNY
+  return [a, b, c]
+
+def usable(move) -> bool:
+  return move.pp > 0 and move.name is not None
+
+def reference(g):
+  # la corsa al ko di un solo stato, opzione per opzione e mossa per mossa
+  me, opp = g.teams[0], g.teams[1]
+  weather = g.weather.condition
+  foe = opp.active
+  my_ttk, opp_ttk, win = np.full((6, 4), np.inf), np.full((6, 4), np.inf), np.zeros((6, 4))
+  for o in range(6):
+    fighter = me.active if o < N_MOVES else me.party[o - N_MOVES]
+    def dmg(m):
+      return calculate_damage(m, fighter.type, foe.type, me.stage[PkmStat.ATTACK], opp.stage[PkmStat.DEFENSE], weather)
+    if o < N_MOVES:
+      move = fighter.moves[o]
+      valid = fighter.hp > 0 and usable(move)
+    else:
+      move = max(fighter.moves, key=lambda m: dmg(m) * m.acc)
+      valid = fighter.hp > 0
+    d = dmg(move)
+    mine = math.ceil(foe.hp / d) / move.acc + (o >= N_MOVES) if d * move.acc > 0 else math.inf
+    for k, opp_move in enumerate(foe.moves):
+      od = calculate_damage(opp_move, foe.type, fighter.type, opp.stage[PkmStat.ATTACK], me.stage[PkmStat.DEFENSE], weather)
+      theirs = math.ceil(fighter.hp / od) / opp_move.acc if od * opp_move.acc > 0 else math.inf
+      opp_ttk[o, k] = theirs
+      if not valid:
+        continue
+      my_ttk[o, k] = mine
+      if bool(move.priority) != bool(opp_move.priority):
+        first = float(bool(move.priority))
+      else:
+        speed = me.stage[PkmStat.SPEED] - opp.stage[PkmStat.SPEED]
+        first = 1. if speed > 0 else 0. if speed < 0 else .5
+      if math.isinf(mine) and math.isinf(theirs):
+        win[o, k] = .5
+      else:
+        win[o, k] = 1. if mine < theirs else 0. if mine > theirs else first
+  return my_ttk, opp_ttk, win
+
+@pytest.mark.parametrize('batch', [[0], [1], [2], [0, 1, 2]])
+def test_batch_matches_per_state_loop(batch):
+  gs = states()
+  race = damage_race([gs[i] for i in batch])
+  assert race.my_ttk.shape == race.opp_ttk.shape == race.win.shape == (len(batch), 6, 4)
+  for b, i in enumerate(batch):
+    my_ttk, opp_ttk, win = reference(gs[i])
+    np.testing.assert_allclose(race.my_ttk[b], my_ttk)
+    np.testing.assert_allclose(race.opp_ttk[b], opp_ttk)
+    np.testing.assert_allclose(race.win[b], win)
+
+def test_batch_equals_single_states():
+  gs = states()
+  batch = damage_race(gs)
+  for i, g in enumerate(gs):
+    single = damage_race([g])[0]
+    for field in ('my_ttk', 'opp_ttk', 'first', 'win', 'valid', 'opp_valid', 'my_damage'):
+      np.testing.assert_array_equal(getattr(batch[i], field), getattr(single, field))
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('vgc')
+
+from vgc.datatypes.Types import PkmType
+
+import Distill
+from bots.AlphaBetaPolicy import AlphaBetaPolicy
+from bots.DistilledEvaluator import DistilledEvaluator, N_FEATURES, fit_linear, fit_mlp
+from bots.StateCodec import decode_state, encode_state
+from factories import make_pkm, make_state
+
+def data(target, n=2000, seed=0):
+  rng = np.random.default_rng(seed)
+  # feature su scale diverse, come quelle vere (hp in [0, 1], danni, conteggi)
+  X = (rng.normal(size=(n, N_FEATURES)) * rng.uniform(.1, 5., N_FEATURES)).astype(np.float32)
+  return X, target(X)
+
+def test_fit_linear_recovers_a_linear_target():
+  w = np.random.default_rng(1).normal(size=N_FEATURES)
+  X, y = data(lambda X: X @ w + 3.)
+  model = fit_linear(X, y, l2=1e-6)
+  # i pesi del modello sono sulle feature normalizzate
+  assert np.allclose(model.W1 / model.std, w, atol=1e-3)
+  X_new, y_new = data(lambda X: X @ w + 3., n=100, seed=2)
+  assert np.allclose(model.predict(X_new), y_new, atol=1e-2)
+
+def test_fit_mlp_reduces_the_loss():
+  X, y = data(lambda X: np.tanh(X[:, 0]) + .5 * np.tanh(X[:, 1] * X[:, 2]))
+  losses = [float(np.mean((fit_mlp(X, y, epochs=epochs, seed=0).predict(X) - y)**2)) for epochs in (1, 50)]
+  assert losses[1] < losses[0] < np.var(y)
+  assert losses[1] < .1 * np.var(y)
+
+def test_saved_model_predicts_the_same(tmp_path):
+  X, y = data(lambda X: np.tanh(X[:, 0]))
+  model = fit_mlp(X, y, epochs=5)
+  path = str(tmp_path / 'model.npz')
+  model.save(path)
+  assert np.allclose(DistilledEvaluator.load(path).predict(X), model.predict(X), atol=1e-5)
+
+def test_label_drops_the_depth_penalty():
+  # nessun ko entro l'orizzonte: tutte le foglie hanno la stessa penalità, l'etichetta è il valore della
+  # ricerca senza penalità di profondità
+  rec = encode_state(make_state([make_pkm(t, 2000.) for t in (PkmType.FIRE, PkmType.WATER, PkmType.GRASS)],
+                                [make_pkm(t, 2000.) for t in (PkmType.GRASS, PkmType.ROCK, PkmType.ICE)]))
+  _, value, action = Distill._label((rec, 2, 0))
+  policy = AlphaBetaPolicy(2, 0, endgame=False)
+  policy.weights['depth'] = 0.
+  assert policy.get_action(decode_state(rec)) == action
+  assert value == pytest.approx(policy.last_value)
@@ -0,0 +1,59 @@
+import pytest
+
+pytest.importorskip('vgc')
+
+from vgc.datatypes.Types import PkmType
+
+from bots.Endgame import EndgameSolver, bucket_key
+from factories import make_move, make_pkm, make_state
+
+def evaluate(g, depth):
+  return 0.
+
+def endgame_state(**kwargs):
+  return make_state([make_pkm(PkmType.FIRE, pkm_id=1)], [make_pkm(PkmType.WATER, pkm_id=2), make_pkm(PkmType.GRASS, pkm_id=3)],
+                    **kwargs)
+
+def test_key_groups_hp_only():
+  g = endgame_state()
+  key = bucket_key(g)
+  g.teams[0].active.hp -= 1.
+  assert bucket_key(g) == key
+  g.teams[0].active.hp -= 50.
+  assert bucket_key(g) != key
+
+@pytest.mark.parametrize('change', ['moves', 'pp', 'species'])
+def test_key_includes_moves_pp_and_species(change):
+  g = endgame_state()
+  key = bucket_key(g)
+  opp = g.teams[1].active
+  if change == 'moves':
+    opp.moves[0] = make_move(120., PkmType.WATER)
+  elif change == 'pp':
+    opp.moves[0].pp -= 1
+  else:
+    opp.pkm_id = 99
+  assert bucket_key(g) != key
+
+def test_memo_starts_empty_at_every_solve():
+  solver = EndgameSolver(evaluate, max_steps=2000)
+  solver.memo[b'stale'] = 1.
+  solver.solve(endgame_state(hp=([120.], [80., 200.])))
+  assert b'stale' not in solver.memo
+
+def test_repetition_is_not_memoized():
+  solver = EndgameSolver(evaluate)
+  g = endgame_state()
+  value, action, dependent = solver._solve(g, 2, {solver.key(g)})
+  assert (value, action, dependent) == (0., None, True)
+  assert solver.memo == {}
+
+def test_budget_counts_steps():
+  solver = EndgameSolver(evaluate, max_steps=5)
+  assert solver.solve(endgame_state()) is None
+  assert solver.steps == 6
+
+def test_value_gives_up_like_solve():
+  solver = EndgameSolver(evaluate, max_steps=5)
+  assert solver.value(endgame_state()) is None
+  assert solver.steps == 6
@@ -0,0 +1,43 @@
+import random
+import time
+
+import pytest
+
+pytest.importorskip('vgc')
+
+from vgc.datatypes.Types import PkmType
+from vgc.datatypes.Objects import PkmMove
+
+from bots.AlphaBetaPolicy import AlphaBetaPolicy
+from bots.MixedPolicy import MixedPolicy
+from factories import make_move, make_pkm, make_state
+
+def state():
+  # due mosse avversarie note, due da stimare
+  return make_state([make_pkm(PkmType.FIRE), make_pkm(PkmType.WATER), make_pkm(PkmType.GRASS)],
+                    [make_pkm(PkmType.WATER, moves=[make_move(90., PkmType.WATER), make_move(40.), PkmMove(name=None),
+                                                    PkmMove(name=None)]), make_pkm(), make_pkm()])
+
+@pytest.mark.parametrize('policy_class', [AlphaBetaPolicy, MixedPolicy])
+def test_ponder_leaves_global_random_and_counters_alone(policy_class):
+  policy = policy_class(2, ponder=True, ponder_duty=1., selective=True)
+  policy.get_action(state())
+  nodes, stats = policy.nodes, dict(policy.selective_stats)
+  before = random.getstate()
+  policy.ponderer.thread.join(timeout=60)
+  assert random.getstate() == before
+  assert policy.ponder_nodes > 0 and len(policy.ponderer.table) > 0
+  assert (policy.nodes, policy.selective_stats) == (nodes, stats)
+  policy.close()
+
+@pytest.mark.parametrize('policy_class', [AlphaBetaPolicy, MixedPolicy])
+def test_close_stops_a_deep_ponder_promptly(policy_class):
+  policy = policy_class(6, ponder=True, ponder_duty=1., endgame=False)
+  policy.ponderer.start(state(), 0)
+  time.sleep(0.2)
+  thread = policy.ponderer.thread
+  assert thread.is_alive()
+  start = time.perf_counter()
+  policy.close()
+  assert time.perf_counter() - start < 1.
+  assert not thread.is_alive() and policy.ponderer.thread is None
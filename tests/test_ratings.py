@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from Ratings import AdaptiveScheduler, Ratings
+
+def play(strengths, seed, budget, battles=10):
+  # torneo adattivo simulato: ogni partita tra i e j è vinta da i con la probabilità di Elo
+  rng = random.Random(seed)
+  names = [f'p{i}' for i in range(len(strengths))]
+  strength = dict(zip(names, strengths))
+  scheduler = AdaptiveScheduler(names, budget=budget)
+  while True:
+    pairs = scheduler.next_pairs(len(names) // 2)
+    if not pairs:
+      return scheduler
+    results = []
+    for i, j in pairs:
+      p = 1 / (1 + 10 ** ((strength[j] - strength[i]) / 400))
+      wins = sum(rng.random() < p for _ in range(battles))
+      results.append((i, wins, j, battles - wins))
+    scheduler.report(results)
+
+@pytest.mark.parametrize('seed', range(20))
+def test_equal_players_never_settle_before_budget(seed):
+  assert play([1500] * 4, seed, budget=300).played == 300
+
+def test_default_budget_is_ten_round_robins():
+  # senza budget il torneo tra giocatori uguali deve comunque finire
+  assert play([1500] * 4, 0, budget=None).played == 60
+
+@pytest.mark.parametrize('seed', range(10))
+def test_distinct_players_settle_in_the_right_order(seed):
+  scheduler = play([1200, 1500, 1800, 2100], seed, budget=300)
+  assert scheduler.played < 300
+  theta, _ = scheduler.ratings.bradley_terry()
+  assert list(theta.argsort()) == [0, 1, 2, 3]
+
+def test_bradley_terry_standard_errors_shrink():
+  ratings = Ratings(['a', 'b'])
+  se = []
+  for _ in range(4):
+    ratings.update([('a', 50, 'b', 50)])
+    _, cov = ratings.bradley_terry()
+    se.append(cov[0, 0] + cov[1, 1] - 2 * cov[0, 1])
+  assert all(later < earlier for earlier, later in zip(se, se[1:]))
+  assert ratings.separation('a', 'b') == pytest.approx(.5)
+
+def test_bradley_terry_exists_for_unbeaten_player():
+  ratings = Ratings(['a', 'b', 'c'])
+  ratings.update([('a', 10, 'b', 0), ('b', 6, 'c', 4)])
+  theta, _ = ratings.bradley_terry()
+  assert theta[0] > theta[1] > theta[2]
+  assert ratings.separation('a', 'c') < ratings.separation('b', 'c') < .5
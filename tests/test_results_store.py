@@ -0,0 +1,91 @@
+import csv
+import threading
+
+import pytest
+
+from ResultsStore import RESULT_COLUMNS, ResultsStore, append_result_csv
+
+ROWS = [("AlphaBeta", "Hayo5", 2, 28., 0), ("AlphaBeta", "Hayo5", 2, 38., 1), ("Greedy", "Hayo5", 0, 50., 1),
+        ("AlphaBeta", "MiniMax", 4, 60., 2)]
+
+def write_csv(path, rows):
+  with open(path, 'w', newline='') as f:
+    writer = csv.writer(f)
+    writer.writerow(RESULT_COLUMNS)
+    writer.writerows(rows)
+
+@pytest.fixture
+def store(tmp_path):
+  s = ResultsStore(str(tmp_path / 'results.db'))
+  yield s
+  s.close()
+
+def test_aggregates_are_running_means(store):
+  store.add_results(ROWS[:2])
+  store.add_result(*ROWS[2])
+  store.add_result(*ROWS[3])
+  assert store.n_results() == 4
+  assert store.aggregates() == [("Hayo5", "AlphaBeta", 2., 33., 2, .5), ("Hayo5", "Greedy", 0., 50., 1, 1.),
+                                ("MiniMax", "AlphaBeta", 4., 60., 1, 2.)]
+
+def test_failed_batch_is_rolled_back(store):
+  with pytest.raises(ValueError):
+    store.add_results([ROWS[0], ("AlphaBeta", "Hayo5", "not a depth", 1., 0)])
+  assert store.n_results() == 0
+  assert store.aggregates() == []
+
+def test_import_only_into_empty_store(store, tmp_path):
+  path = str(tmp_path / 'results.csv')
+  write_csv(path, ROWS)
+  assert store.import_csv(path) == len(ROWS)
+  assert store.import_csv(path) == 0
+  assert store.n_results() == len(ROWS)
+
+def test_import_does_not_read_the_csv_into_a_full_store(store, tmp_path, monkeypatch):
+  store.add_result(*ROWS[0])
+  path = str(tmp_path / 'results.csv')
+  write_csv(path, ROWS)
+  def no_read(*args, **kwargs):
+    raise AssertionError('results.csv read')
+  monkeypatch.setattr('builtins.open', no_read)
+  assert store.import_csv(path) == 0
+
+def test_concurrent_imports_do_not_duplicate(tmp_path):
+  path = str(tmp_path / 'results.csv')
+  write_csv(path, ROWS * 50)
+  db = str(tmp_path / 'results.db')
+  ResultsStore(db).close()
+  imported, start = [], threading.Barrier(4)
+  def tester():
+    s = ResultsStore(db)
+    start.wait()
+    imported.append(s.import_csv(path))
+    s.close()
+  threads = [threading.Thread(target=tester) for _ in range(4)]
+  for t in threads:
+    t.start()
+  for t in threads:
+    t.join()
+  assert sorted(imported) == [0, 0, 0, len(ROWS) * 50]
+  s = ResultsStore(db)
+  assert s.n_results() == len(ROWS) * 50
+  s.close()
+
+def test_export_round_trip(store, tmp_path):
+  store.add_results(ROWS)
+  path = str(tmp_path / 'results.csv')
+  store.export_results(path)
+  other = ResultsStore(str(tmp_path / 'other.db'))
+  assert other.import_csv(path) == len(ROWS)
+  assert other.aggregates() == store.aggregates()
+  other.close()
+
+def test_appended_rows_round_trip(store, tmp_path):
+  path = str(tmp_path / 'results.csv')
+  for row in ROWS:
+    store.add_result(*row)
+    append_result_csv(path, row)
+  other = ResultsStore(str(tmp_path / 'other.db'))
+  assert other.import_csv(path) == len(ROWS)
+  assert other.aggregates() == store.aggregates()
+  other.close()
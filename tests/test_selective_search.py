@@ -0,0 +1,135 @@
+from copy import deepcopy
+
+import numpy as np
+import pytest
+
+pytest.importorskip('vgc')
+
+from vgc.datatypes.Types import PkmType
+from vgc.datatypes.Constants import DEFAULT_N_ACTIONS, TYPE_CHART_MULTIPLIER
+
+from bots.AlphaBetaPolicy import AlphaBetaPolicy, Node
+from bots.MixedPolicy import MixedPolicy
+from factories import make_move, make_pkm, make_state
+
+# ogni regola della ricerca selettiva, attivata da sola, deve scegliere alla radice una mossa che vale quanto
+# la migliore della ricerca completa, su posizioni dove la regola non può cambiare il risultato
+# (a parità di valore l'ordine delle azioni può far scegliere un'altra mossa)
+
+RULES = {'ordering': False, 'immunity': False, 'lmr': False, 'futility': False, 'extensions': False}
+
+# un tipo immune alle mosse normali (GHOST nella tabella dei tipi del motore)
+IMMUNE = next(PkmType(t) for t in range(len(TYPE_CHART_MULTIPLIER)) if TYPE_CHART_MULTIPLIER[PkmType.NORMAL][t] == 0)
+
+def root(g):
+  node = Node()
+  node.gameState = deepcopy(g)
+  return node
+
+def action_values(policy_class, g, depth):
+  # valore esatto di ogni mia azione alla radice con la ricerca completa
+  policy = policy_class(depth, endgame=False)
+  values = []
+  for a in range(DEFAULT_N_ACTIONS):
+    child = Node()
+    child.parent = root(g)
+    child.depth = 1
+    child.action = a
+    child.gameState = child.parent.gameState
+    values.append(policy._min_value(child, -np.inf, np.inf)[0])
+  return np.array(values)
+
+def selective_search(policy_class, g, depth, **rules):
+  policy = policy_class(depth, endgame=False, selective={**RULES, **rules})
+  value, move = policy._max_value(root(g), -np.inf, np.inf)
+  return value, move, policy.selective_stats
+
+def assert_same_root(policy_class, g, depth, rule, **options):
+  values = action_values(policy_class, g, depth)
+  value, move, stats = selective_search(policy_class, g, depth, **{rule: True}, **options)
+  assert value == pytest.approx(values.max())
+  assert values[move] == pytest.approx(values.max())
+  return stats
+
+def plain_pkm(pkm_type, hp=200., powers=(90., 60., 40., 20.), pkm_id=0):
+  # solo mosse di danno senza effetti secondari, la prima stab
+  types = [pkm_type, PkmType.NORMAL, PkmType.FIGHT, PkmType.WATER]
+  return make_pkm(pkm_type, hp, [make_move(p, t) for p, t in zip(powers, types)], pkm_id)
+
+def midgame():
+  return make_state([plain_pkm(PkmType.FIRE), plain_pkm(PkmType.WATER), plain_pkm(PkmType.GRASS)],
+                    [plain_pkm(PkmType.GRASS), plain_pkm(PkmType.ELECTRIC), plain_pkm(PkmType.ROCK)],
+                    hp=([150., 200., 120.], [180., 200., 200.]))
+
+POLICIES = [AlphaBetaPolicy, MixedPolicy]
+
+@pytest.mark.parametrize('policy_class', POLICIES)
+def test_ordering_keeps_the_root_move(policy_class):
+  stats = assert_same_root(policy_class, midgame(), 2, 'ordering')
+  assert stats['ordered'] > 0
+
+@pytest.mark.parametrize('policy_class', POLICIES)
+def test_immunity_keeps_the_root_move(policy_class):
+  # le mosse normali non toccano l'attivo avversario e un pkm in panchina è esausto: quelle azioni valgono
+  # quanto non fare nulla
+  g = make_state([plain_pkm(PkmType.FIRE, powers=(90., 120., 120., 20.)), plain_pkm(PkmType.WATER), plain_pkm(PkmType.GRASS)],
+                 [plain_pkm(IMMUNE), plain_pkm(PkmType.ELECTRIC), plain_pkm(PkmType.ROCK)],
+                 hp=([200., 0., 120.], [200., 200., 200.]))
+  stats = assert_same_root(policy_class, g, 2, 'immunity')
+  assert stats['immunity'] > 0
+
+@pytest.mark.parametrize('policy_class', POLICIES)
+def test_lmr_keeps_the_root_move(policy_class):
+  # le azioni ridotte (mosse deboli e cambi verso pkm quasi esausti) sono dominate dalla mossa stab
+  g = make_state([plain_pkm(PkmType.FIRE, powers=(90., 5., 5., 5.)), plain_pkm(PkmType.WATER), plain_pkm(PkmType.GRASS)],
+                 [plain_pkm(PkmType.GRASS, powers=(40., 30., 20., 10.)), plain_pkm(PkmType.ELECTRIC), plain_pkm(PkmType.ROCK)],
+                 hp=([200., 10., 10.], [200., 200., 200.]))
+  stats = assert_same_root(policy_class, g, 4, 'lmr', lmr_after=1)
+  assert stats['lmr'] > 0
+
+def bad_switches():
+  # cambiare verso i pkm erba contro un attivo fuoco porta a un match up pessimo, da cui le mosse non recuperano
+  return make_state([plain_pkm(PkmType.NORMAL, 800.), plain_pkm(PkmType.GRASS, 800.), plain_pkm(PkmType.GRASS, 800.)],
+                    [plain_pkm(PkmType.FIRE, 800.), plain_pkm(PkmType.FIRE, 800.), plain_pkm(PkmType.FIRE, 800.)])
+
+@pytest.mark.parametrize('policy_class', POLICIES)
+def test_futility_keeps_the_root_move(policy_class):
+  # solo mosse di danno: una mia mossa cambia la valutazione al più degli hp che toglie, senza margine
+  # per stage e status
+  stats = assert_same_root(policy_class, bad_switches(), 4, 'futility', futility_margin=0.)
+  assert stats['futility'] > 0
+
+@pytest.mark.parametrize('policy_class', POLICIES)
+def test_futility_always_searches_switches(policy_class):
+  # nodo di frontiera con alpha irraggiungibile: le mosse si scartano, i cambi si cercano comunque
+  policy = policy_class(4, endgame=False, selective={**RULES, 'futility': True})
+  searched = []
+  min_value = policy._min_value
+  def spy(node, alpha, beta):
+    searched.append(node.action)
+    return min_value(node, alpha, beta)
+  policy._min_value = spy
+  node = root(bad_switches())
+  node.depth = 2
+  value, move = policy._max_value(node, 100., np.inf)
+  assert searched == [4, 5]
+  assert policy.selective_stats['futility'] == 4
+  assert value <= 100.
+
+@pytest.mark.parametrize('policy_class', POLICIES)
+def test_extensions_keep_the_root_move(policy_class):
+  # nessun ko possibile entro l'orizzonte: l'estensione non scatta e la ricerca resta quella completa
+  g = make_state([plain_pkm(PkmType.FIRE, 4000.), plain_pkm(PkmType.WATER, 4000.), plain_pkm(PkmType.GRASS, 4000.)],
+                 [plain_pkm(PkmType.GRASS, 4000.), plain_pkm(PkmType.ELECTRIC, 4000.), plain_pkm(PkmType.ROCK, 4000.)])
+  stats = assert_same_root(policy_class, g, 2, 'extensions')
+  assert stats['extension'] == 0
+
+@pytest.mark.parametrize('policy_class', POLICIES)
+def test_extensions_search_one_more_turn(policy_class):
+  # con ko_turns infinito ogni nodo all'orizzonte viene esteso una volta: la ricerca a profondità 2 vale
+  # quanto quella completa a profondità 4
+  values = action_values(policy_class, bad_switches(), 4)
+  value, move, stats = selective_search(policy_class, bad_switches(), 2, extensions=True, ko_turns=np.inf, max_extensions=2)
+  assert stats['extension'] > 0
+  assert value == pytest.approx(values.max())
+  assert values[move] == pytest.approx(values.max())
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('vgc')
+
+from vgc.datatypes.Types import PkmStat, PkmStatus, PkmType, WeatherCondition
+from vgc.datatypes.Objects import PkmMove
+from vgc.competition.StandardPkmMoves import STANDARD_MOVE_ROSTER
+
+from bots.StateCodec import STATE_DTYPE, decode_state, encode_state, state_bytes
+from factories import make_move, make_pkm, make_state
+
+def state():
+  g = make_state([make_pkm(PkmType.FIRE, 180., pkm_id=4), make_pkm(PkmType.WATER, 200., pkm_id=7),
+                  make_pkm(PkmType.GRASS, 90., pkm_id=9)],
+                 [make_pkm(PkmType.ROCK, 150., [STANDARD_MOVE_ROSTER[0], make_move(70., PkmType.GROUND), PkmMove(name=None),
+                                                make_move(40., priority=True)], pkm_id=11),
+                  make_pkm(PkmType.ICE, pkm_id=12), make_pkm(PkmType.DARK, pkm_id=13)],
+                 hp=([120., 0., 90.], [75.5, 200., 10.]))
+  g.teams[0].active.status = PkmStatus.BURNED
+  g.teams[0].active.moves[1].pp = 3
+  g.teams[0].stage[PkmStat.ATTACK] = 2
+  g.teams[1].stage[PkmStat.SPEED] = -1
+  g.teams[1].confused = True
+  g.weather.condition = WeatherCondition.RAIN
+  return g
+
+def test_round_trip_is_identical():
+  g = state()
+  rec = encode_state(g)
+  decoded = decode_state(rec)
+  assert state_bytes(decoded) == rec.tobytes()
+  assert decoded.teams[0].active.hp == 120.
+  assert decoded.teams[0].active.moves[1].pp == 3
+  assert decoded.teams[0].stage[PkmStat.ATTACK] == 2
+  assert decoded.teams[1].active.moves[0].name == STANDARD_MOVE_ROSTER[0].name
+  assert decoded.teams[1].active.moves[2].name is None
+  assert decoded.teams[1].confused
+  assert decoded.weather.condition == WeatherCondition.RAIN
+
+def test_decoded_state_can_step():
+  decoded = decode_state(encode_state(state()))
+  next_state, _, _, _, _ = decoded.step([0, 0])
+  # lo stato dopo il turno si codifica e decodifica di nuovo
+  rec = encode_state(next_state[0])
+  assert state_bytes(decode_state(rec)) == rec.tobytes()
+
+def test_encode_into_array_view():
+  states = np.zeros(2, dtype=STATE_DTYPE)
+  encode_state(state(), states[1])
+  assert states[0].tobytes() == np.zeros((), dtype=STATE_DTYPE).tobytes()
+  assert states[1].tobytes() == state_bytes(state())
+
+def test_key_changes_with_state():
+  a, b = state(), state()
+  b.teams[1].active.hp -= 1.
+  assert state_bytes(a) != state_bytes(b)
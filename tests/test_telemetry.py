@@ -0,0 +1,95 @@
+import json
+import queue
+import time
+
+import pytest
+
+pytest.importorskip('vgc')
+
+from Telemetry import TelemetryMonitor, TimingPolicy, battle_event, worker_id
+
+class Fixed():
+
+  def __init__(self, action=0):
+    self.action = action
+
+  def get_action(self, g):
+    return self.action
+
+def timer(total, calls, worst):
+  t = TimingPolicy(Fixed())
+  t.total, t.calls, t.max = total, calls, worst
+  return t
+
+def event(worker, duration, battles, turns, policies):
+  return {'worker': worker, 'time': 0., 'duration': duration, 'battles': battles, 'turns': turns, 'policies': policies}
+
+def test_timing_policy_averages_a_batch():
+  t = TimingPolicy(Fixed(3))
+  assert t.get_actions([None] * 4) == [3] * 4
+  assert t.get_action(None) == 3
+  assert t.calls == 5
+  assert 0 <= t.max <= t.total
+
+def test_battle_event_merges_the_same_policy():
+  # le due parti con la stessa politica finiscono in una sola voce: tempi e decisioni sommati, massimo dei massimi
+  e = battle_event([('ab', timer(1., 10, .2)), ('ab', timer(2., 30, .5))], 4., battles=2)
+  assert e['worker'] == worker_id()
+  assert e['duration'] == 4. and e['battles'] == 2
+  assert e['turns'] == 10
+  assert e['policies'] == {'ab': [3., 40, .5]}
+
+def test_battle_event_keeps_each_policy():
+  e = battle_event([('ab', timer(1., 10, .2)), ('random', timer(.1, 10, .05))], 1.)
+  assert e['policies'] == {'ab': [1., 10, .2], 'random': [.1, 10, .05]}
+
+def test_record_aggregates_policies_and_workers(tmp_path):
+  monitor = TelemetryMonitor(str(tmp_path / 'metrics.json'))
+  monitor.record(event('w0', 2., 1, 10, {'ab': [1., 10, .2], 'random': [.1, 10, .05]}))
+  monitor.record(event('w0', 3., 1, 20, {'ab': [2., 20, .4]}))
+  monitor.record(event('w1', 5., 2, 30, {'random': [.3, 30, .01]}))
+  assert monitor.battles == 4
+  assert monitor.turns == 60
+  assert monitor.policies == {'ab': [3., 30, .4], 'random': [pytest.approx(.4), 40, .05]}
+  assert monitor.workers == {'w0': [5., 2], 'w1': [5., 2]}
+
+def test_metrics_rate_eta_and_utilisation(tmp_path):
+  monitor = TelemetryMonitor(str(tmp_path / 'metrics.json'), total_battles=100)
+  # 20 battaglie in 10 secondi: 2/s, ne mancano 80 quindi 40 secondi
+  monitor.start_time = time.time() - 10.
+  monitor.record(event('w0', 4., 10, 100, {'ab': [3., 100, .1]}))
+  monitor.record(event('w1', 20., 10, 200, {'random': [.5, 200, .01]}))
+  m = monitor.metrics()
+  assert m['battles'] == 20 and m['total_battles'] == 100
+  assert m['battles_per_sec'] == pytest.approx(2., rel=1e-2)
+  assert m['eta'] == pytest.approx(40., rel=1e-2)
+  assert m['turns_per_battle'] == 15.
+  # prima la politica con più tempo totale
+  assert list(m['policies']) == ['ab', 'random']
+  assert m['policies']['ab'] == {'decisions': 100, 'avg_ms': 30., 'max_ms': 100., 'total_s': 3.}
+  # utilizzo = tempo occupato / tempo trascorso, al più 1
+  assert m['workers']['w0']['utilisation'] == pytest.approx(.4, rel=1e-2)
+  assert m['workers']['w1']['utilisation'] == 1.
+  assert 'ETA 40s' in monitor.summary(m)
+  assert 'most time in ab (30.0ms/decision)' in monitor.summary(m)
+
+def test_metrics_without_total_or_battles(tmp_path):
+  m = TelemetryMonitor(str(tmp_path / 'metrics.json')).metrics()
+  assert m['eta'] is None and m['turns_per_battle'] is None
+  assert m['policies'] == {} and m['workers'] == {}
+
+def test_eta_is_never_negative(tmp_path):
+  monitor = TelemetryMonitor(str(tmp_path / 'metrics.json'), total_battles=1)
+  monitor.record(event('w0', 1., 3, 3, {}))
+  assert monitor.metrics()['eta'] == 0.
+
+def test_stop_drains_the_queue_and_writes(tmp_path):
+  path = tmp_path / 'metrics.json'
+  monitor = TelemetryMonitor(str(path), interval=3600.)
+  events = queue.Queue()
+  monitor.start(events)
+  for _ in range(5):
+    events.put(event('w0', 1., 1, 10, {'ab': [.1, 10, .02]}))
+  m = monitor.stop()
+  assert m['battles'] == 5
+  assert json.loads(path.read_text())['battles'] == 5
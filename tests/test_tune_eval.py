@@ -0,0 +1,54 @@
+import random
+
+import numpy as np
+
+import TuneEval
+from TuneEval import Tuner
+
+START = {'hp': 3., 'stage': .2, 'depth': .3, 'party_hp': 2.}
+
+class SerialPool():
+
+  def map(self, func, jobs, chunksize=1):
+    return [func(job) for job in jobs]
+
+def battles(monkeypatch, win_rate):
+  # battaglie simulate: l'esito dipende solo dal seed e da win_rate(weights), i seed giocati finiscono in played
+  played = []
+  def play(weights, seed):
+    played.append(seed)
+    return int(random.Random(seed).random() < win_rate(weights))
+  monkeypatch.setattr(TuneEval, 'play_seeded', play)
+  return played
+
+def test_equal_candidate_is_rejected(monkeypatch):
+  battles(monkeypatch, lambda w: .5)
+  tuner = Tuner(SerialPool(), START, seeds_per_eval=400)
+  accepted, diff = tuner.challenge(tuner.x.copy(), list(range(400)))
+  assert not accepted and diff == 0.
+
+def test_noise_is_not_accepted(monkeypatch):
+  # con seed diversi per i due pesi l'esito è rumore puro: una differenza positiva qualsiasi non basta
+  battles(monkeypatch, lambda w: .5)
+  tuner = Tuner(SerialPool(), START, seeds_per_eval=200)
+  tuner.best_results = {s: int(random.Random(s + 1).random() < .5) for s in range(200)}
+  accepted, diff = tuner.challenge(tuner.x.copy(), list(range(200)))
+  assert not accepted
+
+def test_clearly_better_candidate_is_accepted(monkeypatch):
+  battles(monkeypatch, lambda w: .8 if w['hp'] > 3.5 else .3)
+  tuner = Tuner(SerialPool(), START, seeds_per_eval=200)
+  better = tuner.x.copy()
+  better[0] = 1.5
+  accepted, diff = tuner.challenge(better, list(range(200)))
+  assert accepted and diff > .3
+
+def test_challenge_uses_held_out_seeds(monkeypatch, tmp_path):
+  played = battles(monkeypatch, lambda w: .5)
+  np.random.seed(0)
+  tuner = Tuner(SerialPool(), START, seeds_per_eval=20, output=str(tmp_path / 'weights.json'))
+  tuner.run(1)
+  step, challenge = set(played[:40]), set(played[40:])
+  assert len(step) == 20 and len(challenge) == 20
+  assert not step & challenge
+  assert not (tmp_path / 'weights.json').exists()